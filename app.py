@@ -1,24 +1,34 @@
+import os
+
+# Size the native thread pools before TensorFlow and numba load: model
+# kernels get every core, and librosa's numba pool stays small so it doesn't
+# compete. Values already set in the environment win. Under `streamlit run`
+# numpy is imported before this script runs, so OMP_NUM_THREADS here cannot
+# resize numpy's BLAS pool; set it in the launch environment instead, e.g.
+# `OMP_NUM_THREADS=4 streamlit run app.py`.
+CPU_COUNT = os.cpu_count() or 1
+os.environ.setdefault("OMP_NUM_THREADS", str(CPU_COUNT))
+os.environ.setdefault("TF_NUM_INTRAOP_THREADS", str(CPU_COUNT))
+os.environ.setdefault("TF_NUM_INTEROP_THREADS", "2")
+os.environ.setdefault("NUMBA_NUM_THREADS", "2")
+
 import streamlit as st
-import tempfile
 import json
-import os
-import tensorflow as tf
-import librosa
-import librosa.display
-import matplotlib.pyplot as plt
 import numpy as np
 from io import BytesIO
 from supabase import create_client, Client
+from postgrest.exceptions import APIError
 import re
-from datetime import datetime
+import hashlib
+import hmac
+from functools import lru_cache, partial
+from concurrent.futures import ThreadPoolExecutor
 import time
+import xxhash
 
-from pipeline import run_inference
-from utils.pdf_report import generate_pdf_report
-from utils.visualization import create_intensity_timeline
 from config import (
     CLASS_NAMES, CLASS_DISPLAY_NAMES, CLASS_ICONS,
-    TARGET_SR, COLORS, SUPABASE_URL, SUPABASE_KEY
+    TARGET_SR, N_MELS, TARGET_FRAMES, COLORS, SUPABASE_URL, SUPABASE_KEY
 )
 from dotenv import load_dotenv
 
@@ -32,10 +42,13 @@ if not SUPABASE_URL or not SUPABASE_KEY:
     st.error("⚠️ Supabase credentials are missing. Please configure Streamlit secrets.")
     st.stop()
 
-supabase: Client = create_client(
-    SUPABASE_URL,
-    SUPABASE_KEY
-)
+@st.cache_resource
+def get_supabase() -> Client:
+    """Create the Supabase client once per process and share it across reruns"""
+    return create_client(
+        SUPABASE_URL,
+        SUPABASE_KEY
+    )
 
 # ==================================================
 # SESSION STATE INITIALIZATION
@@ -59,6 +72,15 @@ if "audio_data" not in st.session_state:
 if "visualizations" not in st.session_state:
     st.session_state.visualizations = {}
 
+if "viz_file_id" not in st.session_state:
+    st.session_state.viz_file_id = None
+
+if "pdf_report" not in st.session_state:
+    st.session_state.pdf_report = None
+
+if "raw_predictions" not in st.session_state:
+    st.session_state.raw_predictions = None
+
 if "auth_page" not in st.session_state:
     st.session_state.auth_page = "login"
 
@@ -67,36 +89,104 @@ if "auth_page" not in st.session_state:
 # AUTHENTICATION HELPER FUNCTIONS
 # ==================================================
 
+EMAIL_REGEX = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+
+@lru_cache(maxsize=256)
 def validate_email(email):
     """Validate email format"""
-    pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    return re.match(pattern, email) is not None
+    return EMAIL_REGEX.match(email) is not None
 
 def validate_password(password):
     """Validate password strength"""
     if len(password) < 8:
         return False, "Password must be at least 8 characters long"
-    if not any(c.isupper() for c in password):
+    
+    # Single pass: collect character classes as bit flags
+    flags = 0
+    for c in password:
+        if c.isupper():
+            flags |= 1
+        elif c.islower():
+            flags |= 2
+        elif c.isdigit():
+            flags |= 4
+        if flags == 7:
+            break
+    
+    if not flags & 1:
         return False, "Password must contain at least one uppercase letter"
-    if not any(c.islower() for c in password):
+    if not flags & 2:
         return False, "Password must contain at least one lowercase letter"
-    if not any(c.isdigit() for c in password):
+    if not flags & 4:
         return False, "Password must contain at least one number"
     return True, "Password is strong"
 
-def hash_password(password):
-    """Hash password using bcrypt-like method"""
-    import hashlib
+# scrypt cost parameters (~16 MB of memory per hash)
+SCRYPT_N = 2 ** 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+SCRYPT_DKLEN = 32
+
+def generate_salt():
+    """Generate a random per-user salt (hex encoded)"""
+    return os.urandom(16).hex()
+
+def hash_password(password, salt):
+    """Hash password with scrypt using the given hex-encoded salt"""
+    return hashlib.scrypt(
+        password.encode(),
+        salt=bytes.fromhex(salt),
+        n=SCRYPT_N,
+        r=SCRYPT_R,
+        p=SCRYPT_P,
+        dklen=SCRYPT_DKLEN
+    ).hex()
+
+def legacy_hash_password(password):
+    """Unsalted SHA-256 hash used by accounts created before scrypt"""
     return hashlib.sha256(password.encode()).hexdigest()
 
 def verify_user(email, password):
     """Verify user credentials against Supabase"""
+    supabase = get_supabase()
     try:
-        hashed_password = hash_password(password)
-        response = supabase.table("users").select("*").eq("email", email).eq("password_hash", hashed_password).execute()
+        # Single indexed lookup by email, then verify the hash locally
+        response = (
+            supabase.table("users")
+            .select("id,username,email,password_hash,salt")
+            .eq("email", email)
+            .limit(1)
+            .maybe_single()
+            .execute()
+        )
+        
+        if not response or not response.data:
+            return False, None
+        
+        user = response.data
+        salt = user.get("salt")
         
-        if response.data and len(response.data) > 0:
-            return True, response.data[0]
+        if salt:
+            if hmac.compare_digest(user["password_hash"], hash_password(password, salt)):
+                return True, user
+            return False, None
+        
+        # Legacy account: verify the old hash and upgrade it to scrypt
+        if not hmac.compare_digest(user["password_hash"], legacy_hash_password(password)):
+            return False, None
+        
+        salt = generate_salt()
+        supabase.table("users").update({
+            "password_hash": hash_password(password, salt),
+            "salt": salt
+        }).eq("id", user["id"]).execute()
+        return True, user
+    except APIError as e:
+        # Older postgrest clients raise on maybe_single() with zero rows
+        # (HTTP 204) instead of returning None: an unknown email
+        if str(e.code) == "204":
+            return False, None
+        st.error(f"Error verifying user: {str(e)}")
         return False, None
     except Exception as e:
         st.error(f"Error verifying user: {str(e)}")
@@ -104,45 +194,50 @@ def verify_user(email, password):
 
 def create_user(username, email, password):
     """Create new user in Supabase"""
+    supabase = get_supabase()
     try:
-        hashed_password = hash_password(password)
-        
-        # Check if user already exists
-        existing_user = supabase.table("users").select("*").eq("email", email).execute()
-        if existing_user.data and len(existing_user.data) > 0:
-            return False, "User with this email already exists"
-        
-        # Create new user
-        user_data = {
-            "username": username,
-            "email": email,
-            "password_hash": hashed_password,
-            "created_at": datetime.utcnow().isoformat()
-        }
+        salt = generate_salt()
+        hashed_password = hash_password(password, salt)
         
-        response = supabase.table("users").insert(user_data).execute()
+        # Insert atomically; an empty result means the email is taken
+        response = supabase.rpc("create_user_if_absent", {
+            "p_username": username,
+            "p_email": email,
+            "p_password_hash": hashed_password,
+            "p_salt": salt
+        }).execute()
         
-        if response.data and len(response.data) > 0:
+        if response.data:
             return True, "Account created successfully!"
-        return False, "Failed to create account"
+        return False, "User with this email already exists"
     except Exception as e:
         return False, f"Error creating user: {str(e)}"
 
+# Identical form submissions within this window reuse the previous result
+DUPLICATE_SUBMIT_WINDOW = 1.0
+
+def submission_key(*fields):
+    """Digest of the submitted form fields (never store the raw password)"""
+    return hashlib.sha256("\0".join(fields).encode()).hexdigest()
+
+def run_once_per_submission(name, key, func, *args):
+    """Run func(*args) unless the same submission was just handled"""
+    cached = st.session_state.get(name)
+    now = time.monotonic()
+    
+    if cached and cached["key"] == key and now - cached["time"] < DUPLICATE_SUBMIT_WINDOW:
+        return cached["result"]
+    
+    result = func(*args)
+    st.session_state[name] = {"key": key, "time": now, "result": result}
+    return result
+
 # ==================================================
-# LOGIN PAGE
+# AUTH PAGE STYLES
 # ==================================================
 
-def login_page():
-    st.set_page_config(
-        page_title="InstruNet AI - Login",
-        layout="centered",
-        initial_sidebar_state="collapsed"
-    )
-
-    # =======================
-    # GLOBAL CSS
-    # =======================
-    st.markdown("""
+# Shared by the login and signup pages
+AUTH_CSS = """
         <style>
         [data-testid="stSidebar"] {
             display: none;
@@ -180,7 +275,24 @@ def login_page():
             color: #7c3aed;
         }
         </style>
-    """, unsafe_allow_html=True)
+"""
+
+def inject_auth_css():
+    """Inject the shared login/signup page CSS"""
+    st.markdown(AUTH_CSS, unsafe_allow_html=True)
+
+# ==================================================
+# LOGIN PAGE
+# ==================================================
+
+def login_page():
+    st.set_page_config(
+        page_title="InstruNet AI - Login",
+        layout="centered",
+        initial_sidebar_state="collapsed"
+    )
+
+    inject_auth_css()
 
     # =======================
     # HEADER
@@ -197,6 +309,7 @@ def login_page():
     col1, col2, col3 = st.columns([1, 2, 1])
 
     with col2:
+        supabase = get_supabase()
         if not supabase:
             st.error("⚠️ Supabase is not configured.")
             st.stop()
@@ -215,17 +328,6 @@ def login_page():
             </div>
         """, unsafe_allow_html=True)
 
-        # =======================
-        # LOGIN SUCCESS MESSAGE (STEP 3)
-        # =======================
-        if st.session_state.get("login_success"):
-            st.success("✅ Login successful! Redirecting to dashboard…")
-            time.sleep(2)
-
-            st.session_state.authenticated = True
-            st.session_state.login_success = False
-            st.rerun()
-
         # =======================
         # LOGIN FORM (STEP 2)
         # =======================
@@ -244,9 +346,13 @@ def login_page():
                     st.error("❌ Please enter a valid email address")
                 else:
                     with st.spinner("Verifying..."):
-                        success, user_data = verify_user(email, password)
+                        success, user_data = run_once_per_submission(
+                            "last_login", submission_key(email, password),
+                            verify_user, email, password
+                        )
                         if success:
                             st.session_state.user = user_data
+                            st.session_state.authenticated = True
                             st.session_state.login_success = True
                             st.query_params.clear()
                             st.rerun()
@@ -275,47 +381,7 @@ def signup_page():
         initial_sidebar_state="collapsed"
     )
 
-    # =======================
-    # GLOBAL CSS (MATCH LOGIN)
-    # =======================
-    st.markdown("""
-        <style>
-        [data-testid="stSidebar"] {
-            display: none;
-        }
-
-        .block-container {
-            padding-top: 3.0rem;
-        }
-
-        .stTextInput input {
-            border-radius: 8px;
-        }
-
-        .stButton > button {
-            border-radius: 8px;
-            font-weight: 600;
-            padding: 0.6rem;
-        }
-
-        .auth-footer {
-            text-align: center;
-            margin-top: 1.5rem;
-            font-size: 14px;
-            color: #9ca3af;
-        }
-
-        .auth-footer a {
-            color: #8b5cf6;
-            font-weight: 500;
-            text-decoration: underline;
-        }
-
-        .auth-footer a:hover {
-            color: #7c3aed;
-        }
-        </style>
-    """, unsafe_allow_html=True)
+    inject_auth_css()
 
     # =======================
     # HEADER
@@ -332,6 +398,7 @@ def signup_page():
     col1, col2, col3 = st.columns([1, 2, 1])
 
     with col2:
+        supabase = get_supabase()
         if not supabase:
             st.error("⚠️ Supabase is not configured.")
             st.stop()
@@ -377,7 +444,10 @@ def signup_page():
                         st.error(f"❌ {message}")
                     else:
                         with st.spinner("Creating your account..."):
-                            success, msg = create_user(username, email, password)
+                            success, msg = run_once_per_submission(
+                                "last_signup", submission_key(username, email, password),
+                                create_user, username, email, password
+                            )
                             if success:
                                 st.success("✅ " + msg)
                                 st.query_params["auth"] = "login"
@@ -404,28 +474,21 @@ def format_confidence(value):
     """Format confidence value as percentage"""
     return f"{value * 100:.1f}%"
 
-def get_confidence_color(value, threshold):
-    """Get color based on confidence value"""
-    if value >= threshold:
-        return COLORS["success"]
-    elif value >= threshold * 0.5:
-        return COLORS["warning"]
-    else:
-        return COLORS["muted"]
+def get_confidence_colors(values, threshold):
+    """Get colors for an array of confidence values"""
+    values = np.asarray(values, dtype=float)
+    return np.where(
+        values >= threshold,
+        COLORS["success"],
+        np.where(values >= threshold * 0.5, COLORS["warning"], COLORS["muted"])
+    )
 
-def create_instrument_card(instrument, confidence, threshold, is_detected):
-    """Create a styled instrument card"""
-    icon = CLASS_ICONS.get(instrument, "🎵")
-    display_name = CLASS_DISPLAY_NAMES.get(instrument, instrument.upper())
-    color = get_confidence_color(confidence, threshold)
-    
-    status_icon = "✓" if is_detected else "○"
-    status_color = COLORS["success"] if is_detected else COLORS["muted"]
-    
-    card_html = f"""
+# Card markup: icon and display name are filled in once per instrument at
+# import, the doubled-brace fields are filled in per render
+CARD_TEMPLATE = """
     <div style="
         background: white;
-        border-left: 4px solid {color};
+        border-left: 4px solid {{color}};
         padding: 12px 16px;
         border-radius: 8px;
         margin-bottom: 8px;
@@ -436,11 +499,11 @@ def create_instrument_card(instrument, confidence, threshold, is_detected):
                 <span style="font-size: 24px;">{icon}</span>
                 <div>
                     <div style="font-weight: 600; color: #1f2937;">{display_name}</div>
-                    <div style="font-size: 12px; color: #6b7280;">Confidence: {format_confidence(confidence)}</div>
+                    <div style="font-size: 12px; color: #6b7280;">Confidence: {{confidence}}</div>
                 </div>
             </div>
             <div style="
-                background: {status_color};
+                background: {{status_color}};
                 color: white;
                 width: 24px;
                 height: 24px;
@@ -450,246 +513,464 @@ def create_instrument_card(instrument, confidence, threshold, is_detected):
                 justify-content: center;
                 font-weight: bold;
             ">
-                {status_icon}
+                {{status_icon}}
             </div>
         </div>
     </div>
     """
-    return card_html
-
-# ==================================================
-# MAIN APP
-# ==================================================
 
-def main_app():
-    st.set_page_config(
-        page_title="InstruNet AI - Music Instrument Recognition",
-        layout="wide",
-        initial_sidebar_state="expanded"
+CARD_TEMPLATES = {
+    cls: CARD_TEMPLATE.format(
+        icon=CLASS_ICONS.get(cls, "🎵"),
+        display_name=CLASS_DISPLAY_NAMES.get(cls, cls.upper())
     )
+    for cls in CLASS_NAMES
+}
+
+def create_instrument_cards(instruments, confidences, threshold):
+    """Create styled cards for several instruments in one vectorized pass"""
+    confidences = np.asarray(confidences, dtype=float)
+    is_detected = confidences >= threshold
     
-    # Custom CSS
-    st.markdown("""
-        <style>
-        /* Global styles */
-        .block-container {
-            padding-top: 1.5rem;
-            padding-left: 2rem;
-            padding-right: 2rem;
-            padding-bottom: 2rem;
-        }
-        
-        /* Header styles */
-        .main-header {
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            color: white;
-            padding: 1rem 2rem;
-            border-radius: 12px;
-            margin-bottom: 2rem;
-            box-shadow: 0 4px 6px rgba(0,0,0,0.1);
-        }
-        
-        .main-header h1 {
-            margin: 0;
-            font-size: 2rem;
-            font-weight: 700;
-        }
-        
-        .main-header p {
-            margin: 0.5rem 0 0 0;
-            opacity: 0.9;
-        }
-        
-        /* User profile - FIXED: Proper circle avatar */
-        .user-profile {
-            display: flex;
-            align-items: center;
-            gap: 12px;
-            background: white;
-            padding: 10px 16px;
-            border-radius: 8px;
-            box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-        }
-        
-        .user-avatar {
-            width: 40px;
-            height: 40px;
-            min-width: 40px;
-            min-height: 40px;
-            border-radius: 50%;
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            color: white;
-            display: flex;
-            align-items: center;
-            justify-content: center;
-            font-weight: 700;
-            font-size: 18px;
-            flex-shrink: 0;
-        }
-        
-        .user-info {
-            display: flex;
-            flex-direction: column;
-        }
-        
-        .user-name {
-            font-weight: 600;
-            font-size: 14px;
-            color: #1f2937;
-        }
-        
-        .user-role {
-            font-size: 12px;
-            color: #6b7280;
-        }
-        
-        /* Results section */
-        .results-header {
-            background: #f0f9ff;
-            padding: 1rem 1.5rem;
-            border-radius: 8px;
-            margin-bottom: 1rem;
-            border-left: 4px solid #667eea;
-        }
-        
-        .results-header h3 {
-            margin: 0;
-            color: #1f2937;
-        }
-        
-        /* Metric card */
-        .metric-card {
-            background: white;
-            padding: 1.5rem;
-            border-radius: 12px;
-            box-shadow: 0 2px 4px rgba(0,0,0,0.05);
-            text-align: center;
-            border-top: 3px solid #667eea;
-        }
-        
-        .metric-value {
-            font-size: 2rem;
-            font-weight: 700;
-            color: #667eea;
-        }
-        
-        .metric-label {
-            font-size: 0.875rem;
-            color: #6b7280;
-            margin-top: 0.25rem;
-        }
-        
-        /* Expandable section */
-        .expandable-section {
-            background: #f0f9ff;
-            border-radius: 8px;
-            padding: 1rem;
-            margin-top: 1rem;
-        }
-        
-        /* Sidebar styles - FIXED: Dark grey to blend with UI */
-        [data-testid="stSidebar"] {
-            background: linear-gradient(180deg, #374151 0%, #1f2937 100%);
-        }
-        
-        [data-testid="stSidebar"] > div:first-child {
-            background: linear-gradient(180deg, #374151 0%, #1f2937 100%);
-        }
-        
-        /* Sidebar content styling */
-        [data-testid="stSidebar"] .stMarkdown {
-            color: #e5e7eb !important;
-        }
-        
-        [data-testid="stSidebar"] h3 {
-            color: #f3f4f6 !important;
-            font-weight: 700;
-        }
+    colors = get_confidence_colors(confidences, threshold)
+    status_icons = np.where(is_detected, "✓", "○")
+    status_colors = np.where(is_detected, COLORS["success"], COLORS["muted"])
+    
+    cards = []
+    for instrument, confidence, color, status_icon, status_color in zip(
+        instruments, confidences, colors, status_icons, status_colors
+    ):
+        template = CARD_TEMPLATES.get(instrument)
+        if template is None:
+            template = CARD_TEMPLATE.format(icon="🎵", display_name=instrument.upper())
         
-        [data-testid="stSidebar"] label {
-            color: #e5e7eb !important;
-            font-weight: 500;
-        }
+        cards.append(template.format(
+            color=color,
+            confidence=format_confidence(confidence),
+            status_icon=status_icon,
+            status_color=status_color
+        ))
+    return cards
+
+# ==================================================
+# MAIN PAGE STYLES
+# ==================================================
+
+MAIN_CSS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", "styles.css")
+
+@st.cache_data
+def load_css(path):
+    """Read a stylesheet from disk once per process"""
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+# ==================================================
+# AUDIO DECODING
+# ==================================================
+
+def hash_audio_bytes(data):
+    """xxh3 digest of uploaded bytes, far cheaper than Streamlit's default hasher"""
+    return xxhash.xxh3_64_intdigest(data)
+
+AUDIO_HASH_FUNCS = {bytes: hash_audio_bytes}
+
+@st.cache_data(show_spinner=False, hash_funcs=AUDIO_HASH_FUNCS)
+def decode_audio(audio_bytes, target_sr):
+    """Decode uploaded audio bytes once per file"""
+    from utils.audio import load_audio_stream
+    return load_audio_stream(BytesIO(audio_bytes), target_sr), target_sr
+
+@st.cache_data(show_spinner=False, hash_funcs=AUDIO_HASH_FUNCS)
+def compute_mel_db(audio_bytes, sr, n_mels):
+    """Log-mel spectrogram of the uploaded audio, cached per file"""
+    import librosa
+    y, sr = decode_audio(audio_bytes, sr)
+    mel = librosa.feature.melspectrogram(y=y, sr=sr, n_mels=n_mels)
+    return librosa.power_to_db(mel, ref=np.max)
+
+# ==================================================
+# MODEL
+# ==================================================
+
+MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "model")
+ONNX_MODEL_PATH = os.path.join(MODEL_DIR, "instrunet.onnx")
+TFLITE_MODEL_PATH = os.path.join(MODEL_DIR, "instrunet.tflite")
+KERAS_MODEL_PATH = os.path.join(MODEL_DIR, "best_l2_regularized_model.h5")
+
+# The micro-batcher pads every batch to this size, so each backend sees a
+# single input shape: one XLA compile, one TFLite tensor allocation
+MODEL_BATCH_SIZE = 32
+
+@st.cache_resource
+def load_instrunet_model(model_path):
+    """Load the model once per process (ONNX, TFLite, or Keras without optimizer)"""
+    if model_path.endswith(".onnx"):
+        from utils.onnx_model import OnnxModel
+        model = OnnxModel(model_path, num_threads=CPU_COUNT)
+    elif model_path.endswith(".tflite"):
+        from utils.tflite_model import TFLiteModel
+        model = TFLiteModel(model_path, num_threads=CPU_COUNT, batch_size=MODEL_BATCH_SIZE)
+    else:
+        import tensorflow as tf
         
-        [data-testid="stSidebar"] .stSelectbox label,
-        [data-testid="stSidebar"] .stSlider label {
-            color: #e5e7eb !important;
-        }
+        try:
+            tf.config.threading.set_intra_op_parallelism_threads(
+                int(os.environ["TF_NUM_INTRAOP_THREADS"])
+            )
+            tf.config.threading.set_inter_op_parallelism_threads(
+                int(os.environ["TF_NUM_INTEROP_THREADS"])
+            )
+        except RuntimeError:
+            # TensorFlow was already initialized elsewhere in this process
+            pass
         
-        /* Slider values visibility */
-        [data-testid="stSidebar"] .stSlider [data-baseweb="slider"] {
-            color: #e5e7eb !important;
-        }
+        keras_model = tf.keras.models.load_model(model_path, compile=False)
         
-        [data-testid="stSidebar"] .stSlider div[data-testid="stTickBar"] div {
-            color: #d1d5db !important;
-        }
+        # Half-precision activations only pay off on GPUs (including Metal);
+        # CPU-only deployments keep float32
+        if tf.config.list_physical_devices("GPU"):
+            from utils.mixed_precision import to_mixed_float16
+            keras_model = to_mixed_float16(keras_model)
         
-        /* File uploader in sidebar */
-        [data-testid="stSidebar"] [data-testid="stFileUploader"] {
-            background: rgba(55, 65, 81, 0.5);
-            padding: 1rem;
-            border-radius: 8px;
-            border: 2px dashed #6b7280;
-        }
-        
-        [data-testid="stSidebar"] [data-testid="stFileUploader"] label {
-            color: #e5e7eb !important;
-        }
+        # XLA-compile the forward pass for the padded batch shape only
+        xla_forward = tf.function(
+            lambda x: keras_model(x, training=False),
+            jit_compile=True,
+            input_signature=[tf.TensorSpec((MODEL_BATCH_SIZE, N_MELS, TARGET_FRAMES, 1), tf.float32)]
+        )
         
-        /* Success message in sidebar */
-        [data-testid="stSidebar"] .element-container .stSuccess {
-            background: rgba(55, 65, 81, 0.8);
-            border-left: 4px solid #48bb78;
-            padding: 0.75rem;
-            border-radius: 4px;
-        }
+        def model(inputs, training=False):
+            return xla_forward(inputs)
+    
+    # Warm-up call at the padded batch shape so the first analysis doesn't
+    # pay for graph setup or compilation
+    model(np.zeros((MODEL_BATCH_SIZE, N_MELS, TARGET_FRAMES, 1), dtype=np.float32), training=False)
+    return model
+
+@st.cache_resource
+def get_predictor(model_path):
+    """Wrap the cached model in a shared micro-batcher"""
+    from utils.batching import BatchedPredictor
+    return BatchedPredictor(load_instrunet_model(model_path), max_batch_size=MODEL_BATCH_SIZE)
+
+# ==================================================
+# DETECTION
+# ==================================================
+
+def count_detected(results, threshold):
+    """Number of classes at or above the threshold"""
+    # Scores are sorted descending once per analysis, so detections are a prefix
+    return int(np.searchsorted(-results["scores_sorted"], -threshold, side="right"))
+
+# ==================================================
+# PDF REPORT
+# ==================================================
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def build_pdf_report(file_id, audio_name, aggregation, threshold, smoothing,
+                     confidence_items, _visualizations):
+    """PDF report bytes, cached per upload and analysis settings"""
+    # The images are not hashed: the upload (file_id) and threshold fix them
+    # reportlab is only needed once there are results to export
+    from utils.pdf_report import generate_pdf_report
+    return generate_pdf_report(
+        audio_name=audio_name,
+        aggregation=aggregation,
+        threshold=threshold,
+        smoothing=smoothing,
+        confidence_dict=dict(confidence_items),
+        visualizations=_visualizations
+    )
+
+# ==================================================
+# RESULT TABS
+# ==================================================
+
+@st.fragment
+def render_results_tab(results, threshold):
+    """Results tab body; reruns on its own when its widgets change"""
+    names_sorted = results["names_sorted"]
+    scores_sorted = results["scores_sorted"]
+    n_detected = count_detected(results, threshold)
+    
+    # Summary Metrics
+    st.markdown("""
+        <div class="results-header">
+            <h3>🎼 Analysis Summary</h3>
+        </div>
+    """, unsafe_allow_html=True)
+    
+    col1, col2, col3, col4 = st.columns(4)
+    
+    with col1:
+        st.markdown(f"""
+            <div class="metric-card">
+                <div class="metric-value">{n_detected}</div>
+                <div class="metric-label">Instruments Detected</div>
+            </div>
+        """, unsafe_allow_html=True)
+    
+    with col2:
+        avg_confidence = scores_sorted[:n_detected].mean() if n_detected else 0
+        st.markdown(f"""
+            <div class="metric-card">
+                <div class="metric-value">{format_confidence(avg_confidence)}</div>
+                <div class="metric-label">Avg Confidence</div>
+            </div>
+        """, unsafe_allow_html=True)
+    
+    with col3:
+        max_confidence = scores_sorted[0]
+        st.markdown(f"""
+            <div class="metric-card">
+                <div class="metric-value">{format_confidence(max_confidence)}</div>
+                <div class="metric-label">Peak Confidence</div>
+            </div>
+        """, unsafe_allow_html=True)
+    
+    with col4:
+        st.markdown(f"""
+            <div class="metric-card">
+                <div class="metric-value">{format_confidence(threshold)}</div>
+                <div class="metric-label">Threshold Used</div>
+            </div>
+        """, unsafe_allow_html=True)
+    
+    st.markdown("<br>", unsafe_allow_html=True)
+    
+    # Detected Instruments
+    if n_detected:
+        st.markdown("""
+            <div class="results-header">
+                <h3>✅ Detected Instruments (Above Threshold)</h3>
+            </div>
+        """, unsafe_allow_html=True)
         
-        [data-testid="stSidebar"] .element-container .stSuccess p {
-            color: #e5e7eb !important;
-        }
+        detected_cards = create_instrument_cards(
+            names_sorted[:n_detected],
+            scores_sorted[:n_detected],
+            threshold
+        )
+        st.markdown("".join(detected_cards), unsafe_allow_html=True)
+    else:
+        st.warning("⚠️ No instruments detected above the threshold. Try lowering the threshold value.")
+    
+    # Expandable: Full Probability View
+    with st.expander("🔍 View All Class Probabilities", expanded=False):
+        st.markdown("""
+            <div style="background: #f0f9ff; padding: 1rem; border-radius: 8px; margin-bottom: 1rem;">
+                <p style="margin: 0; color: #6b7280; font-size: 14px;">
+                    <strong>Note:</strong> This view shows confidence scores for all instrument classes, 
+                    regardless of the detection threshold. Values below the threshold are shown with 
+                    a muted indicator.
+                </p>
+            </div>
+        """, unsafe_allow_html=True)
         
-        /* Button styles */
-        .stButton > button {
-            border-radius: 8px;
-            font-weight: 600;
-            transition: all 0.3s ease;
-        }
+        all_cards = create_instrument_cards(names_sorted, scores_sorted, threshold)
+        st.markdown("".join(all_cards), unsafe_allow_html=True)
         
-        .stButton > button:hover {
-            transform: translateY(-2px);
-            box-shadow: 0 4px 8px rgba(0,0,0,0.15);
-        }
+        # Data table view
+        st.markdown("##### 📊 Tabular View")
         
-        /* Primary button color */
-        .stButton > button[kind="primary"] {
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            border: none;
-        }
+        # Only the Status column depends on the threshold
+        table = results.get("table")
+        if table is None:
+            import pandas as pd
+            table = results["table"] = pd.DataFrame({
+                "Instrument": [CLASS_DISPLAY_NAMES.get(cls, cls.upper()) for cls in names_sorted],
+                "Class Code": names_sorted,
+                "Confidence": np.char.mod("%.1f%%", scores_sorted * 100)
+            })
         
-        /* Download button styles */
-        .stDownloadButton > button {
-            border-radius: 8px;
-            font-weight: 600;
-        }
+        df = table.assign(
+            Status=np.where(scores_sorted >= threshold, "✓ Detected", "○ Below Threshold")
+        )
         
-        /* Tab styling */
-        .stTabs [data-baseweb="tab-list"] {
-            gap: 8px;
-        }
+        st.dataframe(df, use_container_width=True, hide_index=True)
+
+# Figures are 12 in wide and shown at 6.5 in in the PDF, so 100 dpi is
+# still ~185 ppi on the page
+FIGURE_DPI = 100
+
+def figure_to_png(fig):
+    """Rasterize a standalone figure once to RGB PNG bytes"""
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from PIL import Image
+    
+    # Draw straight into an Agg buffer; constrained layout already fits the
+    # margins, so no tight-bbox pass is needed
+    fig.set_dpi(FIGURE_DPI)
+    canvas = FigureCanvasAgg(fig)
+    canvas.draw()
+    
+    # The figures are opaque, so drop the alpha channel before encoding. Fast
+    # zlib level: the PNGs are short-lived and ReportLab recompresses them
+    rgb = np.asarray(canvas.buffer_rgba())[:, :, :3]
+    buf = BytesIO()
+    Image.fromarray(rgb).save(buf, format="png", compress_level=1)
+    return buf.getvalue()
+
+def render_waveform_png(y, sr):
+    """Waveform plot as PNG bytes"""
+    from matplotlib.figure import Figure
+    from utils.visualization import waveform_envelope
+    
+    fig = Figure(figsize=(12, 3), layout="constrained")
+    ax = fig.subplots()
+    # Plot a min/max envelope rather than every sample
+    duration = len(y) / sr
+    envelope = waveform_envelope(y)
+    ax.plot(np.linspace(0, duration, len(envelope)), envelope, color='#667eea', linewidth=0.8)
+    ax.set_xlim(0, duration)
+    ax.set_xlabel("Time (seconds)", fontsize=11)
+    ax.set_ylabel("Amplitude", fontsize=11)
+    ax.grid(True, alpha=0.3)
+    return figure_to_png(fig)
+
+def render_mel_spec_png(mel_db, sr):
+    """Mel spectrogram plot as PNG bytes"""
+    import librosa.display
+    from matplotlib.figure import Figure
+    
+    fig = Figure(figsize=(12, 4), layout="constrained")
+    ax = fig.subplots()
+    img = librosa.display.specshow(
+        mel_db, sr=sr, x_axis="time", y_axis="mel",
+        ax=ax, cmap='viridis'
+    )
+    fig.colorbar(img, ax=ax, format="%+2.0f dB")
+    ax.set_xlabel("Time (seconds)", fontsize=11)
+    ax.set_ylabel("Frequency (Hz)", fontsize=11)
+    return figure_to_png(fig)
+
+def render_timeline_png(times, smoothed, threshold):
+    """Intensity timeline plot as PNG bytes"""
+    from utils.visualization import create_intensity_timeline
+    return figure_to_png(create_intensity_timeline(times, smoothed, threshold, CLASS_NAMES))
+
+def render_pngs(jobs):
+    """Run independent figure renders, on a thread each when there are several"""
+    if len(jobs) <= 1:
+        return {key: job() for key, job in jobs.items()}
+    
+    # Agg drawing and zlib encoding of separate figures overlap well
+    with ThreadPoolExecutor(max_workers=len(jobs)) as executor:
+        futures = {key: executor.submit(job) for key, job in jobs.items()}
+        return {key: future.result() for key, future in futures.items()}
+
+MEL_IMAGE_MAX_COLS = 1600
+MEL_IMAGE_ROW_SCALE = 3
+
+@st.cache_data(show_spinner=False, hash_funcs=AUDIO_HASH_FUNCS)
+def mel_spec_image(audio_bytes, sr, n_mels):
+    """Mel spectrogram as a colormapped RGB array, skipping matplotlib drawing"""
+    import matplotlib.pyplot as plt
+    
+    mel_db = compute_mel_db(audio_bytes, sr, n_mels)
+    
+    # Average frames into at most MEL_IMAGE_MAX_COLS columns
+    step = -(-mel_db.shape[1] // MEL_IMAGE_MAX_COLS)
+    if step > 1:
+        cols = mel_db.shape[1] // step
+        mel_db = mel_db[:, :cols * step].reshape(mel_db.shape[0], cols, step).mean(axis=2)
+    
+    span = mel_db.max() - mel_db.min()
+    scaled = (mel_db - mel_db.min()) / (span + 1e-9)
+    rgb = (plt.get_cmap("viridis")(scaled)[:, :, :3] * 255).astype(np.uint8)
+    
+    # Low frequencies at the bottom, rows stretched to a readable height
+    return np.repeat(np.flipud(rgb), MEL_IMAGE_ROW_SCALE, axis=0)
+
+def update_visualizations(audio_data, results, threshold, include_mel_spec=False):
+    """Render the plot images used by the Visualizations tab and the PDF"""
+    visualizations = st.session_state.visualizations
+    
+    if st.session_state.viz_file_id != audio_data["file_id"]:
+        visualizations.pop("waveform", None)
+        visualizations.pop("mel_spec", None)
+        st.session_state.viz_file_id = audio_data["file_id"]
+    
+    # Figures still to draw, keyed by their entry in visualizations. Inputs
+    # come from cached functions here, on the script thread
+    jobs = {}
+    
+    # Waveform only changes with the upload, so it is drawn once per file
+    # and kept as PNG bytes
+    if "waveform" not in visualizations:
+        jobs["waveform"] = partial(render_waveform_png, audio_data["y"], audio_data["sr"])
+    
+    # The full matplotlib spectrogram is only needed for the PDF
+    if include_mel_spec and "mel_spec" not in visualizations:
+        sr = audio_data["sr"]
+        jobs["mel_spec"] = partial(
+            render_mel_spec_png, compute_mel_db(audio_data["bytes"], sr, N_MELS), sr
+        )
+    
+    # Intensity Timeline (if results available), rasterized once per
+    # analysis and threshold and shared by the tab and the PDF
+    visualizations.pop("timeline", None)
+    if results:
+        times = results.get("times", [])
+        smoothed = results.get("smoothed", [])
         
-        .stTabs [data-baseweb="tab"] {
-            padding: 10px 20px;
-            border-radius: 8px 8px 0 0;
-        }
+        if times and len(smoothed) > 0:
+            cached = results.get("timeline_png")
+            if cached is not None and cached[0] == threshold:
+                visualizations["timeline"] = cached[1]
+            else:
+                jobs["timeline"] = partial(render_timeline_png, times, smoothed, threshold)
+    
+    visualizations.update(render_pngs(jobs))
+    if "timeline" in jobs:
+        results["timeline_png"] = (threshold, visualizations["timeline"])
+    
+    return visualizations
+
+@st.fragment
+def render_viz_tab(audio_data, threshold):
+    """Visualization tab body; reruns on its own when its widgets change"""
+    visualizations = update_visualizations(audio_data, st.session_state.results, threshold)
+    
+    # Waveform
+    st.markdown("### 🌊 Waveform")
+    st.caption("Time-domain representation showing amplitude variations")
+    
+    st.image(visualizations["waveform"])
+    
+    st.markdown("---")
+    
+    # Mel Spectrogram
+    st.markdown("### 🎨 Mel Spectrogram")
+    st.caption("Frequency-domain representation used as CNN input")
+    
+    st.image(mel_spec_image(audio_data["bytes"], audio_data["sr"], N_MELS))
+    
+    if "timeline" in visualizations:
+        st.markdown("---")
+        st.markdown("### 📈 Instrument Intensity Timeline")
+        st.caption("Temporal confidence evolution for detected instruments")
         
-        /* Audio player styling */
-        [data-testid="stAudio"] {
-            border-radius: 8px;
-            overflow: hidden;
-        }
-        </style>
-    """, unsafe_allow_html=True)
+        st.image(visualizations["timeline"])
+
+# ==================================================
+# MAIN APP
+# ==================================================
+
+def main_app():
+    st.set_page_config(
+        page_title="InstruNet AI - Music Instrument Recognition",
+        layout="wide",
+        initial_sidebar_state="expanded"
+    )
+    
+    # Non-blocking confirmation shown once after login
+    if st.session_state.login_success:
+        st.toast("Login successful!", icon="✅")
+        st.session_state.login_success = False
+    
+    # Custom CSS
+    st.markdown(f"<style>{load_css(MAIN_CSS_PATH)}</style>", unsafe_allow_html=True)
     
     # ==================================================
     # HEADER
@@ -725,6 +1006,9 @@ def main_app():
             st.session_state.results = None
             st.session_state.audio_data = None
             st.session_state.visualizations = {}
+            st.session_state.viz_file_id = None
+            st.session_state.pdf_report = None
+            st.session_state.raw_predictions = None
             st.session_state.auth_page = "login"
             st.rerun()
     
@@ -751,11 +1035,17 @@ def main_app():
             st.audio(audio_bytes)
             st.success(f"✅ **{audio_file.name}** loaded")
             
-            # Store audio data in session state
-            st.session_state.audio_data = {
-                "bytes": audio_bytes,
-                "name": audio_name
-            }
+            # Store audio data in session state, decoding only on a new upload
+            cached = st.session_state.audio_data
+            if cached is None or cached["file_id"] != audio_file.file_id:
+                y, sr = decode_audio(audio_bytes, TARGET_SR)
+                st.session_state.audio_data = {
+                    "file_id": audio_file.file_id,
+                    "bytes": audio_bytes,
+                    "name": audio_name,
+                    "y": y,
+                    "sr": sr
+                }
         
         st.markdown("---")
         st.markdown("### ⚙️ Analysis Settings")
@@ -791,13 +1081,19 @@ def main_app():
     # MAIN CONTENT AREA
     # ==================================================
     
-    tab1, tab2, tab3 = st.tabs(["📊 Results", "📈 Visualizations", "📄 Export"])
+    # st.tabs runs every tab body on each rerun; a radio lets only the
+    # visible view execute
+    views = ["📊 Results", "📈 Visualizations", "📄 Export"]
+    active_tab = st.radio(
+        "View", views, horizontal=True,
+        key="active_tab", label_visibility="collapsed"
+    )
     
     # ==================================================
     # TAB 1: RESULTS
     # ==================================================
     
-    with tab1:
+    if active_tab == views[0]:
         if st.session_state.results is None:
             st.info("""
                 ### 👋 Welcome to InstruNet AI!
@@ -814,201 +1110,23 @@ def main_app():
                 - 📄 Professional PDF and JSON reports
             """)
         else:
-            results = st.session_state.results
-            confidence_dict = {
-                cls: float(results["aggregated"][i])
-                for i, cls in enumerate(CLASS_NAMES)
-            }
-            
-            detected_instruments = {
-                cls: score for cls, score in confidence_dict.items()
-                if score >= threshold
-            }
-            
-            # Summary Metrics
-            st.markdown("""
-                <div class="results-header">
-                    <h3>🎼 Analysis Summary</h3>
-                </div>
-            """, unsafe_allow_html=True)
-            
-            col1, col2, col3, col4 = st.columns(4)
-            
-            with col1:
-                st.markdown(f"""
-                    <div class="metric-card">
-                        <div class="metric-value">{len(detected_instruments)}</div>
-                        <div class="metric-label">Instruments Detected</div>
-                    </div>
-                """, unsafe_allow_html=True)
-            
-            with col2:
-                avg_confidence = np.mean(list(detected_instruments.values())) if detected_instruments else 0
-                st.markdown(f"""
-                    <div class="metric-card">
-                        <div class="metric-value">{format_confidence(avg_confidence)}</div>
-                        <div class="metric-label">Avg Confidence</div>
-                    </div>
-                """, unsafe_allow_html=True)
-            
-            with col3:
-                max_confidence = max(confidence_dict.values())
-                st.markdown(f"""
-                    <div class="metric-card">
-                        <div class="metric-value">{format_confidence(max_confidence)}</div>
-                        <div class="metric-label">Peak Confidence</div>
-                    </div>
-                """, unsafe_allow_html=True)
-            
-            with col4:
-                st.markdown(f"""
-                    <div class="metric-card">
-                        <div class="metric-value">{format_confidence(threshold)}</div>
-                        <div class="metric-label">Threshold Used</div>
-                    </div>
-                """, unsafe_allow_html=True)
-            
-            st.markdown("<br>", unsafe_allow_html=True)
-            
-            # Detected Instruments
-            if detected_instruments:
-                st.markdown("""
-                    <div class="results-header">
-                        <h3>✅ Detected Instruments (Above Threshold)</h3>
-                    </div>
-                """, unsafe_allow_html=True)
-                
-                # Sort by confidence (descending)
-                sorted_detected = sorted(
-                    detected_instruments.items(),
-                    key=lambda x: x[1],
-                    reverse=True
-                )
-                
-                for cls, score in sorted_detected:
-                    st.markdown(
-                        create_instrument_card(cls, score, threshold, True),
-                        unsafe_allow_html=True
-                    )
-            else:
-                st.warning("⚠️ No instruments detected above the threshold. Try lowering the threshold value.")
-            
-            # Expandable: Full Probability View
-            with st.expander("🔍 View All Class Probabilities", expanded=False):
-                st.markdown("""
-                    <div style="background: #f0f9ff; padding: 1rem; border-radius: 8px; margin-bottom: 1rem;">
-                        <p style="margin: 0; color: #6b7280; font-size: 14px;">
-                            <strong>Note:</strong> This view shows confidence scores for all instrument classes, 
-                            regardless of the detection threshold. Values below the threshold are shown with 
-                            a muted indicator.
-                        </p>
-                    </div>
-                """, unsafe_allow_html=True)
-                
-                # Sort all instruments by confidence
-                sorted_all = sorted(
-                    confidence_dict.items(),
-                    key=lambda x: x[1],
-                    reverse=True
-                )
-                
-                for cls, score in sorted_all:
-                    is_detected = score >= threshold
-                    st.markdown(
-                        create_instrument_card(cls, score, threshold, is_detected),
-                        unsafe_allow_html=True
-                    )
-                
-                # Data table view
-                st.markdown("##### 📊 Tabular View")
-                
-                import pandas as pd
-                df = pd.DataFrame([
-                    {
-                        "Instrument": CLASS_DISPLAY_NAMES.get(cls, cls.upper()),
-                        "Class Code": cls,
-                        "Confidence": format_confidence(score),
-                        "Status": "✓ Detected" if score >= threshold else "○ Below Threshold"
-                    }
-                    for cls, score in sorted_all
-                ])
-                
-                st.dataframe(df, use_container_width=True, hide_index=True)
+            render_results_tab(st.session_state.results, threshold)
     
     # ==================================================
     # TAB 2: VISUALIZATIONS
     # ==================================================
     
-    with tab2:
+    elif active_tab == views[1]:
         if st.session_state.audio_data is None:
             st.info("📊 Upload and analyze an audio file to view visualizations")
         else:
-            audio_bytes = st.session_state.audio_data["bytes"]
-            y, sr = librosa.load(BytesIO(audio_bytes), sr=TARGET_SR, mono=True)
-            
-            # Waveform
-            st.markdown("### 🌊 Waveform")
-            st.caption("Time-domain representation showing amplitude variations")
-            
-            fig_wav, ax = plt.subplots(figsize=(12, 3))
-            librosa.display.waveshow(y, sr=sr, ax=ax, color='#667eea')
-            ax.set_xlabel("Time (seconds)", fontsize=11)
-            ax.set_ylabel("Amplitude", fontsize=11)
-            ax.grid(True, alpha=0.3)
-            plt.tight_layout()
-            st.pyplot(fig_wav)
-            st.session_state.visualizations["waveform"] = fig_wav
-            plt.close(fig_wav)
-            
-            st.markdown("---")
-            
-            # Mel Spectrogram
-            st.markdown("### 🎨 Mel Spectrogram")
-            st.caption("Frequency-domain representation used as CNN input")
-            
-            mel = librosa.feature.melspectrogram(y=y, sr=sr, n_mels=128)
-            mel_db = librosa.power_to_db(mel, ref=np.max)
-            
-            fig_mel, ax = plt.subplots(figsize=(12, 4))
-            img = librosa.display.specshow(
-                mel_db, sr=sr, x_axis="time", y_axis="mel",
-                ax=ax, cmap='viridis'
-            )
-            fig_mel.colorbar(img, ax=ax, format="%+2.0f dB")
-            ax.set_xlabel("Time (seconds)", fontsize=11)
-            ax.set_ylabel("Frequency (Hz)", fontsize=11)
-            plt.tight_layout()
-            st.pyplot(fig_mel)
-            
-            # Store for PDF
-            st.session_state.visualizations["mel_spec"] = fig_mel
-            plt.close(fig_mel)
-            
-            # Intensity Timeline (if results available)
-            if st.session_state.results:
-                st.markdown("---")
-                st.markdown("### 📈 Instrument Intensity Timeline")
-                st.caption("Temporal confidence evolution for detected instruments")
-                
-                results = st.session_state.results
-                times = results.get("times", [])
-                smoothed = results.get("smoothed", [])
-                
-                if times and len(smoothed) > 0:
-                    fig_timeline = create_intensity_timeline(
-                        times, smoothed, threshold, CLASS_NAMES
-                    )
-                    st.pyplot(fig_timeline)
-                    
-                    # Store for PDF
-                    st.session_state.visualizations["timeline"] = fig_timeline
-                    plt.close(fig_timeline)
+            render_viz_tab(st.session_state.audio_data, threshold)
     
     # ==================================================
     # TAB 3: EXPORT
     # ==================================================
     
-    with tab3:
+    else:
         if st.session_state.results is None:
             st.info("📦 Complete an analysis to export results")
         else:
@@ -1074,31 +1192,46 @@ def main_app():
                 
                 st.markdown("<br>", unsafe_allow_html=True)
                 
-                confidence_dict = {
-                    cls: float(results["aggregated"][i])
-                    for i, cls in enumerate(CLASS_NAMES)
-                    if results["aggregated"][i] >= threshold
-                }
+                n_detected = count_detected(results, threshold)
+                confidence_dict = dict(zip(
+                    results["names_sorted"][:n_detected],
+                    results["scores_sorted"][:n_detected].tolist()
+                ))
                 
-                # Generate PDF
-                pdf_path = generate_pdf_report(
-                    audio_name=st.session_state.audio_data['name'],
-                    aggregation=aggregation,
-                    threshold=threshold,
-                    smoothing=smoothing,
-                    confidence_dict=confidence_dict,
-                    visualizations=st.session_state.visualizations
+                pdf_key = (
+                    st.session_state.audio_data['file_id'],
+                    st.session_state.audio_data['name'],
+                    aggregation,
+                    threshold,
+                    smoothing,
+                    tuple(confidence_dict.items())
                 )
                 
-                with open(pdf_path, "rb") as f:
+                # Generate PDF only on request; it is rendered in memory
+                if st.button("🛠️ Prepare PDF Report", use_container_width=True):
+                    with st.spinner("Generating PDF..."):
+                        # The Visualizations view may not have run yet
+                        visualizations = update_visualizations(
+                            st.session_state.audio_data, results, threshold,
+                            include_mel_spec=True
+                        )
+                        st.session_state.pdf_report = {
+                            "key": pdf_key,
+                            "bytes": build_pdf_report(*pdf_key, visualizations)
+                        }
+                
+                pdf_report = st.session_state.pdf_report
+                if pdf_report is not None and pdf_report["key"] == pdf_key:
                     st.download_button(
                         label="📥 Download PDF Report",
-                        data=f,
+                        data=pdf_report["bytes"],
                         file_name=f"{st.session_state.audio_data['name']}_analysis.pdf",
                         mime="application/pdf",
                         use_container_width=True,
                         type="primary"
                     )
+                else:
+                    st.caption("Prepare the report to download it with the current settings.")
     
     # ==================================================
     # INFERENCE EXECUTION
@@ -1106,36 +1239,54 @@ def main_app():
     
     if audio_bytes and run_clicked:
         with st.spinner("🔄 Analyzing audio... This may take a moment."):
-            # Save to temp file
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as f:
-                f.write(audio_bytes)
-                temp_path = f.name
-            
-            # Load model
-            BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-            model_path = os.path.join(BASE_DIR, "model", "best_l2_regularized_model.h5")
-            if not os.path.exists(model_path):
-                st.error(f"❌ Model file not found: {model_path}")
+            # Load model, preferring the converted ONNX, then TFLite file
+            if os.path.exists(ONNX_MODEL_PATH):
+                model_path = ONNX_MODEL_PATH
+            elif os.path.exists(TFLITE_MODEL_PATH):
+                model_path = TFLITE_MODEL_PATH
+            elif os.path.exists(KERAS_MODEL_PATH):
+                model_path = KERAS_MODEL_PATH
+            else:
+                st.error(f"❌ Model file not found: {KERAS_MODEL_PATH}")
                 st.stop()
             
-            model = tf.keras.models.load_model(model_path)
+            # librosa and the inference pipeline load on the first analysis
+            from pipeline import segment_audio, predict_segments, postprocess_predictions
             
-            # Run inference - pass audio_name for proper JSON metadata
-            smoothed, times, aggregated, json_out = run_inference(
-                temp_path, model, aggregation, threshold, smoothing, audio_name=audio_name
+            # Raw model outputs only depend on the audio and the model, so
+            # re-analyzing with new settings skips the CNN entirely
+            predictions_key = (hash_audio_bytes(audio_bytes), model_path)
+            raw = st.session_state.raw_predictions
+            if raw is None or raw["key"] != predictions_key:
+                model = get_predictor(model_path)
+                
+                # Run inference on the already decoded signal
+                segments, times = segment_audio(st.session_state.audio_data["y"])
+                raw = st.session_state.raw_predictions = {
+                    "key": predictions_key,
+                    "predictions": predict_segments(segments, model),
+                    "times": times
+                }
+            
+            # Pass audio_name for proper JSON metadata
+            smoothed, times, aggregated, json_out = postprocess_predictions(
+                raw["predictions"], raw["times"], aggregation, threshold, smoothing, audio_name=audio_name
             )
             
+            # Sort classes by confidence once; reruns only slice by threshold
+            aggregated = np.asarray(aggregated, dtype=float)
+            order = np.argsort(-aggregated, kind="stable")
+            
             # Store results
             st.session_state.results = {
                 "aggregated": aggregated,
+                "names_sorted": [CLASS_NAMES[i] for i in order],
+                "scores_sorted": aggregated[order],
                 "json": json_out,
                 "smoothed": smoothed,
                 "times": times
             }
             
-            # Clean up temp file
-            os.unlink(temp_path)
-            
             st.success("✅ Analysis complete!")
             st.rerun()
 
@@ -10,6 +10,7 @@ N_FFT = 2048  # FFT window size
 SEGMENT_DURATION = 3.0  # Segment duration in seconds
 HOP_DURATION = 1.5  # Hop duration in seconds
 TARGET_FRAMES = 126  # Expected number of time frames in mel spectrogram
+SEGMENT_FRAMES = 1 + int(SEGMENT_DURATION * TARGET_SR) // HOP_LENGTH  # Frames a full segment yields (centered STFT)
 
 # Alternative names for compatibility
 WINDOW_SEC = SEGMENT_DURATION  # Alias for segment duration
@@ -2,17 +2,30 @@
 Pipeline for audio inference and analysis
 """
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 import librosa
 import json
 from datetime import datetime
-from config import CLASS_NAMES, TARGET_SR, N_MELS, HOP_LENGTH, N_FFT, SEGMENT_DURATION, HOP_DURATION, TARGET_FRAMES
+from config import (
+    CLASS_NAMES, TARGET_SR, N_MELS, HOP_LENGTH, N_FFT, SEGMENT_DURATION, HOP_DURATION,
+    TARGET_FRAMES, SEGMENT_FRAMES
+)
+from utils.audio import load_audio_stream
+from utils.features import batch_mel_db
+
+# segment_audio always yields full-length segments, so every spectrogram has
+# SEGMENT_FRAMES frames and only needs trimming to the model's TARGET_FRAMES
+assert SEGMENT_FRAMES >= TARGET_FRAMES, "segments are too short for the model input"
+
+# Segments per feature chunk when overlapping feature extraction with inference
+PREDICT_CHUNK_SIZE = 32
 
 
 def extract_mel_spectrogram(audio_path, sr=TARGET_SR, n_mels=N_MELS, hop_length=HOP_LENGTH, n_fft=N_FFT):
     """
     Extract mel spectrogram from audio file
     """
-    y, _ = librosa.load(audio_path, sr=sr, mono=True)
+    y = load_audio_stream(audio_path, sr)
     mel_spec = librosa.feature.melspectrogram(
         y=y, sr=sr, n_mels=n_mels, hop_length=hop_length, n_fft=n_fft
     )
@@ -20,71 +33,105 @@ def extract_mel_spectrogram(audio_path, sr=TARGET_SR, n_mels=N_MELS, hop_length=
     return mel_spec_db
 
 
-def segment_audio(audio_path, segment_duration=SEGMENT_DURATION, hop_duration=HOP_DURATION, sr=TARGET_SR):
+def segment_audio(audio, segment_duration=SEGMENT_DURATION, hop_duration=HOP_DURATION, sr=TARGET_SR):
     """
     Segment audio into overlapping windows
+    
+    Args:
+        audio: Audio file path, or an already decoded mono signal at `sr`
+    
+    Returns:
+        segments: Read-only (n_segments, segment_samples) view of the audio
+        times: Start time of each segment in seconds
     """
-    y, _ = librosa.load(audio_path, sr=sr, mono=True)
+    if isinstance(audio, np.ndarray):
+        y = audio
+    else:
+        y = load_audio_stream(audio, sr)
     
     segment_samples = int(segment_duration * sr)
     hop_samples = int(hop_duration * sr)
     
-    segments = []
-    times = []
-    
-    for start in range(0, len(y), hop_samples):
-        end = start + segment_samples
-        if end > len(y):
-            # Pad last segment if needed
-            segment = np.pad(y[start:], (0, end - len(y)), mode='constant')
-        else:
-            segment = y[start:end]
-        
-        segments.append(segment)
-        times.append(start / sr)
-        
-        # Break if we've processed the whole audio
-        if end >= len(y):
-            break
+    if len(y) == 0:
+        return np.empty((0, segment_samples), dtype=y.dtype), []
+    
+    # Windows start every hop until one reaches the end of the audio
+    n_segments = max(0, -(-(len(y) - segment_samples) // hop_samples)) + 1
+    
+    # Zero-pad the tail once so the last window is full length
+    padded_len = (n_segments - 1) * hop_samples + segment_samples
+    y = np.pad(y, (0, max(0, padded_len - len(y))), mode='constant')
+    
+    segments = sliding_window_view(y, segment_samples)[::hop_samples][:n_segments]
+    times = (np.arange(n_segments) * hop_samples / sr).tolist()
     
     return segments, times
 
 
+def segments_to_inputs(segments, sr=TARGET_SR, n_mels=N_MELS, hop_length=HOP_LENGTH, n_fft=N_FFT):
+    """
+    Build the model input batch for a list of segments
+    
+    Returns:
+        float32 array of shape (len(segments), 128, 126, 1)
+    """
+    inputs = np.empty((len(segments), n_mels, TARGET_FRAMES, 1), dtype=np.float32)
+    if len(segments) == 0:
+        return inputs
+    
+    # Mel spectrograms for all segments in batched STFT passes. The per-segment
+    # ref=np.max offset is skipped: standardization below removes it anyway
+    mel_spec_db = batch_mel_db(
+        segments, sr=sr, n_mels=n_mels, hop_length=hop_length, n_fft=n_fft, ref_max=False
+    )
+    if mel_spec_db.shape[2] < TARGET_FRAMES:
+        raise ValueError(
+            f"Segments yield {mel_spec_db.shape[2]} frames, the model expects {TARGET_FRAMES}"
+        )
+    
+    # Per-segment statistics over all frames, before trimming. Sum and sum of
+    # squares are gathered in one read each (float64 accumulators) instead of
+    # std() re-deriving the mean and materializing squared deviations
+    flat = mel_spec_db.reshape(len(mel_spec_db), -1)
+    mean = flat.sum(axis=1, dtype=np.float64) / flat.shape[1]
+    mean_sq = np.einsum("ij,ij->i", flat, flat, dtype=np.float64) / flat.shape[1]
+    scale = np.sqrt(np.maximum(mean_sq - mean * mean, 0.0)) + 1e-6
+    mean = mean.astype(np.float32)[:, np.newaxis, np.newaxis]
+    scale = scale.astype(np.float32)[:, np.newaxis, np.newaxis]
+    
+    # Trim to the model input (128, TARGET_FRAMES), normalizing in place in
+    # the output buffer to avoid full-size temporaries
+    out = inputs[:, :, :, 0]
+    np.subtract(mel_spec_db[:, :, :TARGET_FRAMES], mean, out=out)
+    out /= scale
+    
+    return inputs
+
+
 def predict_segments(segments, model, sr=TARGET_SR, n_mels=N_MELS, hop_length=HOP_LENGTH, n_fft=N_FFT):
     """
     Predict instrument probabilities for each segment
     
     Model expects input shape: (batch, 128, 126, 1)
     """
-    predictions = []
+    if len(segments) == 0:
+        return np.array([])
     
-    for segment in segments:
-        # Extract mel spectrogram
-        mel_spec = librosa.feature.melspectrogram(
-            y=segment, sr=sr, n_mels=n_mels, hop_length=hop_length, n_fft=n_fft
-        )
-        mel_spec_db = librosa.power_to_db(mel_spec, ref=np.max)
-        
-        # Normalize
-        mel_spec_db = (mel_spec_db - mel_spec_db.mean()) / (mel_spec_db.std() + 1e-6)
-        
-        # Fix shape to match model input (128, TARGET_FRAMES)
-        if mel_spec_db.shape[1] < TARGET_FRAMES:
-            # Pad if too short
-            pad_width = TARGET_FRAMES - mel_spec_db.shape[1]
-            mel_spec_db = np.pad(mel_spec_db, ((0, 0), (0, pad_width)), mode='constant')
-        elif mel_spec_db.shape[1] > TARGET_FRAMES:
-            # Trim if too long
-            mel_spec_db = mel_spec_db[:, :TARGET_FRAMES]
-        
-        # Add channel dimension and batch dimension: (1, 128, TARGET_FRAMES, 1)
-        input_data = mel_spec_db[np.newaxis, ..., np.newaxis]
-        
-        # Predict
-        pred = model.predict(input_data, verbose=0)[0]
-        predictions.append(pred)
-    
-    return np.array(predictions)
+    # A micro-batching predictor runs the model on its own worker thread:
+    # queue each chunk as soon as its spectrograms are ready so the next
+    # chunk's features are computed while the model is busy
+    if hasattr(model, "submit"):
+        futures = []
+        for start in range(0, len(segments), PREDICT_CHUNK_SIZE):
+            inputs = segments_to_inputs(
+                segments[start:start + PREDICT_CHUNK_SIZE], sr, n_mels, hop_length, n_fft
+            )
+            futures.extend(model.submit(x) for x in inputs)
+        return np.stack([future.result() for future in futures])
+    
+    # Run the model once for all segments
+    inputs = segments_to_inputs(segments, sr, n_mels, hop_length, n_fft)
+    return np.asarray(model.predict(inputs, verbose=0))
 
 
 def smooth_predictions(predictions, window_size=3):
@@ -94,15 +141,24 @@ def smooth_predictions(predictions, window_size=3):
     if window_size <= 1:
         return predictions
     
-    smoothed = np.copy(predictions)
     n_segments, n_classes = predictions.shape
+    half = window_size // 2
     
-    for i in range(n_segments):
-        start = max(0, i - window_size // 2)
-        end = min(n_segments, i + window_size // 2 + 1)
-        smoothed[i] = predictions[start:end].mean(axis=0)
+    # Window bounds per segment, truncated at the edges
+    idx = np.arange(n_segments)
+    start = np.maximum(idx - half, 0)
+    end = np.minimum(idx + half + 1, n_segments)
     
-    return smoothed
+    # Window sums from a cumulative sum with a leading zero row
+    csum = np.zeros((n_segments + 1, n_classes))
+    np.cumsum(predictions, axis=0, out=csum[1:])
+
+    # Differences and averages in place on the gathered rows
+    smoothed = csum[end]
+    smoothed -= csum[start]
+    smoothed /= (end - start)[:, np.newaxis]
+    
+    return smoothed.astype(predictions.dtype, copy=False)
 
 
 def aggregate_predictions(predictions, method='mean'):
@@ -121,17 +177,20 @@ def aggregate_predictions(predictions, method='mean'):
         raise ValueError(f"Unknown aggregation method: {method}")
 
 
-def run_inference(audio_path, model, aggregation='mean', threshold=0.25, smoothing=3, audio_name=None):
+def postprocess_predictions(predictions, times, aggregation='mean', threshold=0.25, smoothing=3, audio_name="audio"):
     """
-    Run complete inference pipeline
+    Smooth, aggregate and export raw per-segment predictions
+    
+    Only this stage depends on the analysis settings, so callers that keep
+    the raw predictions can re-run it without touching the model.
     
     Args:
-        audio_path: Path to audio file
-        model: Trained model
+        predictions: Raw model outputs of shape (n_segments, n_classes)
+        times: Time points for each segment
         aggregation: Aggregation method ('mean', 'max', 'voting')
         threshold: Detection threshold
         smoothing: Smoothing window size
-        audio_name: Original audio filename (optional)
+        audio_name: Audio name recorded in the JSON output
     
     Returns:
         smoothed: Smoothed predictions
@@ -139,32 +198,21 @@ def run_inference(audio_path, model, aggregation='mean', threshold=0.25, smoothi
         aggregated: Aggregated predictions
         json_output: JSON output dictionary
     """
-    # Segment audio
-    segments, times = segment_audio(audio_path)
-    
-    # Predict for each segment
-    predictions = predict_segments(segments, model)
-    
     # Smooth predictions
     smoothed = smooth_predictions(predictions, window_size=smoothing)
     
     # Aggregate predictions
     aggregated = aggregate_predictions(smoothed, method=aggregation)
     
-    # Generate JSON output
-    timeline = []
-    for i, time_sec in enumerate(times):
-        intensity = {cls: float(smoothed[i, j]) for j, cls in enumerate(CLASS_NAMES)}
-        timeline.append({
-            "time_sec": float(time_sec),
-            "intensity": intensity
-        })
-    
-    # Use audio_name if provided, otherwise use audio_path
-    display_name = audio_name if audio_name else audio_path
+    # Generate JSON output, converting values to Python floats in bulk
+    rows = np.asarray(smoothed, dtype=float).tolist()
+    timeline = [
+        {"time_sec": float(time_sec), "intensity": dict(zip(CLASS_NAMES, row))}
+        for time_sec, row in zip(times, rows)
+    ]
     
     json_output = {
-        "audio_file": display_name,
+        "audio_file": audio_name,
         "segment_duration_sec": SEGMENT_DURATION,
         "hop_duration_sec": HOP_DURATION,
         "aggregation": aggregation,
@@ -174,4 +222,39 @@ def run_inference(audio_path, model, aggregation='mean', threshold=0.25, smoothi
         "timeline": timeline
     }
     
-    return smoothed, times, aggregated, json_output
\ No newline at end of file
+    return smoothed, times, aggregated, json_output
+
+
+def run_inference(audio, model, aggregation='mean', threshold=0.25, smoothing=3, audio_name=None):
+    """
+    Run complete inference pipeline
+    
+    Args:
+        audio: Path to audio file, or a decoded mono signal at TARGET_SR
+        model: Trained model
+        aggregation: Aggregation method ('mean', 'max', 'voting')
+        threshold: Detection threshold
+        smoothing: Smoothing window size
+        audio_name: Original audio filename (optional)
+    
+    Returns:
+        smoothed: Smoothed predictions
+        times: Time points for each segment
+        aggregated: Aggregated predictions
+        json_output: JSON output dictionary
+    """
+    # Segment audio
+    segments, times = segment_audio(audio)
+    
+    # Predict for each segment
+    predictions = predict_segments(segments, model)
+    
+    # Use audio_name if provided, otherwise the path when there is one
+    if audio_name:
+        display_name = audio_name
+    elif isinstance(audio, np.ndarray):
+        display_name = "audio"
+    else:
+        display_name = audio
+    
+    return postprocess_predictions(predictions, times, aggregation, threshold, smoothing, display_name)
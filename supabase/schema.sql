@@ -0,0 +1,43 @@
+-- ==================================================
+-- InstruNet AI - Supabase schema
+-- ==================================================
+
+create table if not exists users (
+    id bigint generated by default as identity primary key,
+    username text not null,
+    email text not null,
+    password_hash text not null,
+    salt text,
+    created_at timestamptz not null default now()
+);
+
+-- Per-user scrypt salt (hex). NULL for legacy SHA-256 accounts,
+-- which are upgraded on their next successful login.
+alter table users add column if not exists salt text;
+
+-- Signup timestamps come from the database clock
+alter table users alter column created_at set default now();
+
+-- Logins look users up by email alone, so keep it uniquely indexed
+create unique index if not exists users_email_key on users (email);
+
+-- Signup in one round-trip: the uniqueness check and insert happen
+-- atomically, returning no rows when the email already exists.
+-- Only the new id is returned, not the whole row with its hash.
+drop function if exists create_user_if_absent(text, text, text, text, timestamptz);
+drop function if exists create_user_if_absent(text, text, text, text);
+
+create or replace function create_user_if_absent(
+    p_username text,
+    p_email text,
+    p_password_hash text,
+    p_salt text
+)
+returns setof bigint
+language sql
+as $$
+    insert into users (username, email, password_hash, salt)
+    values (p_username, p_email, p_password_hash, p_salt)
+    on conflict (email) do nothing
+    returning id;
+$$;
@@ -0,0 +1,65 @@
+"""
+Tests for utils.batching.BatchedPredictor and the pipeline's submit() path
+"""
+import threading
+
+import numpy as np
+import pytest
+
+from utils.batching import BatchedPredictor
+
+
+class RecordingModel:
+    """Callable stand-in for a Keras model that records input shapes"""
+
+    def __init__(self):
+        self.shapes = []
+        self._lock = threading.Lock()
+
+    def __call__(self, inputs, training=False):
+        with self._lock:
+            self.shapes.append(inputs.shape)
+        return np.abs(inputs).reshape(len(inputs), -1).sum(axis=1, keepdims=True)
+
+    def predict(self, inputs, verbose=0):
+        return self(np.asarray(inputs, dtype=np.float32))
+
+
+def test_batches_are_padded_and_trimmed():
+    model = RecordingModel()
+    predictor = BatchedPredictor(model, max_batch_size=4, timeout=0.5)
+    inputs = np.arange(30, dtype=np.float32).reshape(5, 3, 2)
+
+    outputs = predictor.predict(inputs)
+
+    assert model.shapes == [(4, 3, 2), (4, 3, 2)]
+    np.testing.assert_array_equal(outputs, inputs.sum(axis=(1, 2))[:, np.newaxis])
+
+
+def test_model_errors_reach_every_future():
+    def failing_model(inputs, training=False):
+        raise RuntimeError("model failed")
+
+    predictor = BatchedPredictor(failing_model, max_batch_size=4, timeout=0.5)
+    futures = [predictor.submit(np.zeros((3, 2), dtype=np.float32)) for _ in range(3)]
+
+    for future in futures:
+        with pytest.raises(RuntimeError, match="model failed"):
+            future.result(timeout=5)
+
+
+def test_predict_segments_submit_path_matches_predict():
+    pytest.importorskip("librosa")
+    from config import TARGET_SR
+    from pipeline import PREDICT_CHUNK_SIZE, predict_segments, segment_audio
+
+    rng = np.random.default_rng(0)
+    y = (0.1 * rng.standard_normal(80 * TARGET_SR)).astype(np.float32)
+    segments, _ = segment_audio(y)
+    assert len(segments) > PREDICT_CHUNK_SIZE
+
+    expected = predict_segments(segments, RecordingModel())
+    actual = predict_segments(segments, BatchedPredictor(RecordingModel(), max_batch_size=8))
+
+    assert actual.shape == expected.shape == (len(segments), 1)
+    np.testing.assert_allclose(actual, expected, rtol=1e-5)
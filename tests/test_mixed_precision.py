@@ -0,0 +1,50 @@
+"""
+Tests for utils.mixed_precision.to_mixed_float16
+"""
+import numpy as np
+import pytest
+
+tf = pytest.importorskip("tensorflow")
+
+from utils.mixed_precision import to_mixed_float16
+
+
+def _sequential():
+    return tf.keras.Sequential([
+        tf.keras.Input((8,)),
+        tf.keras.layers.Dense(16, activation="relu"),
+        tf.keras.layers.Dense(4, activation="sigmoid"),
+    ])
+
+
+def _functional():
+    # Two outputs, so the first output layer is not the last stored layer
+    inputs = tf.keras.Input((8,))
+    hidden = tf.keras.layers.Dense(16, activation="relu")(inputs)
+    scores = tf.keras.layers.Dense(4, activation="sigmoid", name="scores")(hidden)
+    extra = tf.keras.layers.Dense(8, activation="relu")(hidden)
+    aux = tf.keras.layers.Dense(2, activation="sigmoid", name="aux")(extra)
+    return tf.keras.Model(inputs, [scores, aux])
+
+
+@pytest.mark.parametrize("build", [_sequential, _functional])
+def test_to_mixed_float16(build):
+    model = build()
+    x = np.random.default_rng(0).standard_normal((5, 8)).astype(np.float32)
+
+    mixed = to_mixed_float16(model)
+
+    for expected, actual in zip(model.get_weights(), mixed.get_weights()):
+        assert actual.dtype == np.float32
+        np.testing.assert_array_equal(actual, expected)
+
+    expected_outputs = tf.nest.flatten(model(x, training=False))
+    mixed_outputs = tf.nest.flatten(mixed(x, training=False))
+    assert len(mixed_outputs) == len(expected_outputs)
+    for expected, actual in zip(expected_outputs, mixed_outputs):
+        assert actual.dtype == tf.float32
+        np.testing.assert_allclose(actual.numpy(), expected.numpy(), atol=1e-2)
+
+    # Hidden layers actually compute in float16
+    hidden = [layer for layer in mixed.layers if layer.name not in {"scores", "aux"}]
+    assert any(layer.compute_dtype == "float16" for layer in hidden)
@@ -0,0 +1,84 @@
+"""
+Regression tests pinning the batched model-input path (segment_audio +
+segments_to_inputs) to the original per-segment librosa computation
+"""
+import numpy as np
+import pytest
+
+librosa = pytest.importorskip("librosa")
+
+from config import TARGET_SR, N_MELS, HOP_LENGTH, N_FFT, SEGMENT_DURATION, HOP_DURATION, TARGET_FRAMES
+from pipeline import segment_audio, segments_to_inputs
+
+SEGMENT_SAMPLES = int(SEGMENT_DURATION * TARGET_SR)
+HOP_SAMPLES = int(HOP_DURATION * TARGET_SR)
+
+
+def _reference_segments(y):
+    """Original segmentation loop"""
+    segments, times = [], []
+    for start in range(0, len(y), HOP_SAMPLES):
+        end = start + SEGMENT_SAMPLES
+        if end > len(y):
+            segment = np.pad(y[start:], (0, end - len(y)), mode='constant')
+        else:
+            segment = y[start:end]
+        segments.append(segment)
+        times.append(start / TARGET_SR)
+        if end >= len(y):
+            break
+    return segments, times
+
+
+def _reference_input(segment):
+    """Original per-segment librosa features"""
+    mel_spec = librosa.feature.melspectrogram(
+        y=segment, sr=TARGET_SR, n_mels=N_MELS, hop_length=HOP_LENGTH, n_fft=N_FFT
+    )
+    mel_spec_db = librosa.power_to_db(mel_spec, ref=np.max)
+    mel_spec_db = (mel_spec_db - mel_spec_db.mean()) / (mel_spec_db.std() + 1e-6)
+    if mel_spec_db.shape[1] < TARGET_FRAMES:
+        mel_spec_db = np.pad(mel_spec_db, ((0, 0), (0, TARGET_FRAMES - mel_spec_db.shape[1])), mode='constant')
+    return mel_spec_db[:, :TARGET_FRAMES, np.newaxis]
+
+
+def _signal(n_samples, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.arange(n_samples) / TARGET_SR
+    y = 0.3 * np.sin(2 * np.pi * 440.0 * t) + 0.2 * np.sin(2 * np.pi * 1250.0 * t)
+    y += 0.05 * rng.standard_normal(n_samples)
+    return y.astype(np.float32)
+
+
+def _with_silence():
+    # Silence covering whole segments and parts of others
+    y = _signal(8 * TARGET_SR)
+    y[int(1.2 * TARGET_SR):int(5.7 * TARGET_SR)] = 0.0
+    return y
+
+
+CLIPS = {
+    "short": _signal(TARGET_SR),
+    "exact_multiple": _signal(3 * SEGMENT_SAMPLES),
+    "one_sample_past": _signal(3 * SEGMENT_SAMPLES + 1),
+    "silence": _with_silence(),
+}
+
+
+@pytest.mark.parametrize("name", list(CLIPS))
+def test_inputs_match_per_segment_librosa(name):
+    y = CLIPS[name]
+
+    segments, times = segment_audio(y)
+    expected_segments, expected_times = _reference_segments(y)
+
+    assert len(segments) == len(expected_segments)
+    np.testing.assert_allclose(times, expected_times)
+    np.testing.assert_array_equal(np.asarray(segments), np.stack(expected_segments))
+
+    inputs = segments_to_inputs(segments)
+    expected = np.stack([_reference_input(segment) for segment in expected_segments])
+
+    assert inputs.shape == (len(expected_segments), N_MELS, TARGET_FRAMES, 1)
+    assert inputs.dtype == np.float32
+    np.testing.assert_allclose(inputs, expected, atol=1e-5)
@@ -4,29 +4,53 @@ InstruNet AI - Utility Modules
 
 This package contains utility functions for audio processing,
 feature extraction, visualization, and report generation.
+
+Submodules are imported on first attribute access, so importing one
+module (e.g. utils.batching) does not pull in librosa, matplotlib or
+reportlab.
 """
 
-from .aggregation import aggregate, moving_average
-from .audio import load_audio, stereo_to_mono, peak_normalize, trim_silence, fix_duration
-from .features import generate_log_mel, fix_mel_frames
-from .segmentation import sliding_windows
-from .visualization import plot_intensity, create_intensity_timeline
-from .io import intensity_to_json
-from .pdf_report import generate_pdf_report
-
-__all__ = [
-    'aggregate',
-    'moving_average',
-    'load_audio',
-    'stereo_to_mono',
-    'peak_normalize',
-    'trim_silence',
-    'fix_duration',
-    'generate_log_mel',
-    'fix_mel_frames',
-    'sliding_windows',
-    'plot_intensity',
-    'create_intensity_timeline',
-    'intensity_to_json',
-    'generate_pdf_report',
-]
\ No newline at end of file
+import importlib
+
+# Public name -> submodule that defines it
+_EXPORTS = {
+    'aggregate': 'aggregation',
+    'moving_average': 'aggregation',
+    'load_audio': 'audio',
+    'load_audio_stream': 'audio',
+    'stereo_to_mono': 'audio',
+    'peak_normalize': 'audio',
+    'trim_silence': 'audio',
+    'fix_duration': 'audio',
+    'generate_log_mel': 'features',
+    'fix_mel_frames': 'features',
+    'batch_mel_db': 'features',
+    'batch_log_mel': 'features',
+    'sliding_windows': 'segmentation',
+    'plot_intensity': 'visualization',
+    'create_intensity_timeline': 'visualization',
+    'waveform_envelope': 'visualization',
+    'managed_figure': 'visualization',
+    'intensity_to_json': 'io',
+    'generate_pdf_report': 'pdf_report',
+    'BatchedPredictor': 'batching',
+    'TFLiteModel': 'tflite_model',
+    'convert_keras_to_tflite': 'tflite_model',
+    'OnnxModel': 'onnx_model',
+    'convert_keras_to_onnx': 'onnx_model',
+    'to_mixed_float16': 'mixed_precision',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{_EXPORTS[name]}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
\ No newline at end of file
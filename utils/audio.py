@@ -1,12 +1,90 @@
 # utils/audio.py
 
+import os
+import shutil
+import tempfile
+
 import numpy as np
 import librosa
+import soundfile as sf
+import soxr
 
 def load_audio(path, sr):
-    y, _ = librosa.load(path, sr=sr, mono=False)
+    y, _ = librosa.load(path, sr=sr, mono=False, res_type="soxr_hq")
     return stereo_to_mono(y)
 
+# Containers libsndfile decodes sample-exactly from any offset. Block-wise
+# reads of lossy formats (MP3) glitch at every block boundary, so those
+# are decoded in one read
+STREAMABLE_FORMATS = {"WAV", "WAVEX", "W64", "RF64", "AIFF", "AU", "CAF", "FLAC", "RAW"}
+
+def _load_audio_fallback(path, sr):
+    """
+    Decode with librosa/audioread, which only opens paths: file-like input
+    is spooled to a temporary file first
+    """
+    if not hasattr(path, "read"):
+        y, _ = librosa.load(path, sr=sr, mono=True, res_type="soxr_hq")
+        return y
+    
+    path.seek(0)
+    with tempfile.NamedTemporaryFile(delete=False) as f:
+        shutil.copyfileobj(path, f)
+        temp_path = f.name
+    try:
+        y, _ = librosa.load(temp_path, sr=sr, mono=True, res_type="soxr_hq")
+    finally:
+        os.remove(temp_path)
+    return y
+
+def load_audio_stream(path, sr, block_sec=30.0):
+    """
+    Decode audio block by block, downmixing and resampling as it streams
+    
+    Peak memory is one block of the source file plus the output signal,
+    instead of the whole file at its native rate. Only PCM and lossless
+    formats (STREAMABLE_FORMATS) are streamed; others are read in one go.
+    
+    Args:
+        path: Audio file path or file-like object
+        sr: Target sample rate
+        block_sec: Block duration in seconds
+    
+    Returns:
+        Mono float32 audio at the target sample rate
+    """
+    try:
+        f = sf.SoundFile(path)
+    except (sf.LibsndfileError, RuntimeError):
+        # Formats libsndfile cannot decode fall back to librosa/audioread,
+        # resampled with soxr like the streaming path
+        return _load_audio_fallback(path, sr)
+    
+    with f:
+        native_sr = f.samplerate
+        
+        if f.format not in STREAMABLE_FORMATS:
+            y = f.read(dtype="float32", always_2d=True).mean(axis=1)
+            if native_sr != sr:
+                y = soxr.resample(y, native_sr, sr, quality="HQ")
+            return y
+        
+        resampler = soxr.ResampleStream(native_sr, sr, 1, dtype="float32") if native_sr != sr else None
+        
+        chunks = []
+        for block in f.blocks(blocksize=int(block_sec * native_sr), dtype="float32", always_2d=True):
+            mono = block.mean(axis=1)
+            if resampler is not None:
+                mono = resampler.resample_chunk(mono)
+            chunks.append(mono)
+        
+        if resampler is not None:
+            chunks.append(resampler.resample_chunk(np.zeros(0, dtype=np.float32), last=True))
+    
+    if not chunks:
+        return np.zeros(0, dtype=np.float32)
+    return np.concatenate(chunks)
+
 def stereo_to_mono(audio):
     if audio.ndim == 1:
         return audio
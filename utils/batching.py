@@ -0,0 +1,90 @@
+# utils/batching.py
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class BatchedPredictor:
+    """
+    Server-side micro-batcher around a Keras model
+
+    Requests from every session are queued and a single worker thread
+    stacks them into batches of up to `max_batch_size` rows, waiting at
+    most `timeout` seconds for a batch to fill before running the model.
+    Partial batches are zero-padded to `max_batch_size`, so the model only
+    ever sees one input shape (no per-size XLA recompiles or TFLite
+    tensor reallocations); outputs for the padding rows are dropped.
+
+    Exposes `predict(inputs, verbose=0)` so it can be passed anywhere a
+    Keras model is expected for inference.
+    """
+
+    def __init__(self, model, max_batch_size=32, timeout=0.02):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.timeout = timeout
+
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def submit(self, x):
+        """
+        Queue a single input (without batch dimension)
+
+        Returns:
+            Future resolving to the model output for that input
+        """
+        future = Future()
+        self._queue.put((np.asarray(x, dtype=np.float32), future))
+        return future
+
+    def predict(self, inputs, verbose=0):
+        """
+        Predict a batch of inputs, sharing model calls with other callers
+
+        Args:
+            inputs: Array of shape (batch, ...)
+            verbose: Ignored, kept for Keras API compatibility
+
+        Returns:
+            Array of model outputs, one row per input
+        """
+        futures = [self.submit(x) for x in inputs]
+        return np.stack([future.result() for future in futures])
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.timeout
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            futures = [future for _, future in batch]
+
+            try:
+                inputs = np.zeros((self.max_batch_size,) + batch[0][0].shape, dtype=np.float32)
+                np.stack([x for x, _ in batch], out=inputs[:len(batch)])
+                outputs = np.asarray(self.model(inputs, training=False))[:len(batch)]
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+                continue
+
+            for future, output in zip(futures, outputs):
+                future.set_result(output)
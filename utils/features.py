@@ -1,3 +1,5 @@
+from functools import lru_cache
+
 import librosa
 import numpy as np
 from config import N_MELS, EPS, SEGMENT_DURATION, HOP_LENGTH, TARGET_SR
@@ -44,4 +46,82 @@ def fix_mel_frames(mel, sr=TARGET_SR):
         mel = np.pad(mel, ((0, 0), (0, TARGET_FRAMES - mel.shape[1])), mode='constant')
     
     # Return only target frames
-    return mel[:, :TARGET_FRAMES]
\ No newline at end of file
+    return mel[:, :TARGET_FRAMES]
+
+@lru_cache(maxsize=8)
+def _stft_constants(sr, n_fft, n_mels):
+    """Hann window and mel filterbank, built once per parameter set"""
+    window = librosa.filters.get_window("hann", n_fft, fftbins=True).astype(np.float32)
+    mel_basis = librosa.filters.mel(sr=sr, n_fft=n_fft, n_mels=n_mels).astype(np.float32)
+    window.flags.writeable = False
+    mel_basis.flags.writeable = False
+    return window, mel_basis
+
+def batch_mel_db(segments, sr=TARGET_SR, n_mels=N_MELS, hop_length=HOP_LENGTH,
+                 n_fft=2048, top_db=80.0, chunk_size=32, ref_max=True):
+    """
+    Log-mel spectrograms for equal-length segments in batched NumPy passes
+
+    Matches calling librosa.feature.melspectrogram (center=True, constant
+    padding, periodic Hann window, power 2) and
+    librosa.power_to_db(ref=np.max) on each segment, but frames, FFTs
+    and projects onto the mel basis `chunk_size` segments at a time.
+
+    Args:
+        segments: Array of shape (n_segments, n_samples)
+        sr: Sample rate
+        ref_max: Subtract each segment's peak level (ref=np.max). Callers
+            that standardize each spectrogram afterwards can skip it, as
+            a constant dB offset per segment does not survive mean removal
+
+    Returns:
+        float32 array of shape (n_segments, n_mels, 1 + n_samples // hop_length)
+    """
+    segments = np.asarray(segments, dtype=np.float32)
+    n_segments, n_samples = segments.shape
+    n_frames = 1 + n_samples // hop_length
+
+    window, mel_basis = _stft_constants(sr, n_fft, n_mels)
+
+    out = np.empty((n_segments, n_mels, n_frames), dtype=np.float32)
+    pad = n_fft // 2
+
+    for start in range(0, n_segments, chunk_size):
+        chunk = np.pad(segments[start:start + chunk_size], ((0, 0), (pad, pad)), mode="constant")
+
+        # (chunk, n_frames, n_fft) strided frames -> power spectra
+        frames = np.lib.stride_tricks.sliding_window_view(chunk, n_fft, axis=1)[:, ::hop_length][:, :n_frames]
+        power = np.abs(np.fft.rfft(frames * window, axis=-1)) ** 2
+
+        # Mel projection as one matmul: (n_mels, bins) x (chunk, bins, n_frames)
+        out[start:start + chunk_size] = mel_basis @ power.transpose(0, 2, 1)
+
+    # power_to_db in place: amin floor, optional per-segment reference and
+    # a top_db floor relative to each segment's peak
+    np.maximum(out, 1e-10, out=out)
+    np.log10(out, out=out)
+    out *= 10.0
+    peak = out.max(axis=(1, 2), keepdims=True)
+    if ref_max:
+        out -= peak
+        peak = np.zeros_like(peak)
+    return np.maximum(out, peak - top_db, out=out)
+
+def batch_log_mel(segments, sr=TARGET_SR):
+    """
+    Batched equivalent of generate_log_mel for equal-length segments
+
+    Args:
+        segments: Array of shape (n_segments, n_samples), e.g. the view
+            returned by segmentation.sliding_windows
+        sr: Sample rate
+
+    Returns:
+        Normalized log-mel spectrograms of shape (n_segments, N_MELS, n_frames)
+    """
+    mel_db = batch_mel_db(segments, sr=sr, n_mels=N_MELS, hop_length=512, n_fft=2048)
+    mean = mel_db.mean(axis=(1, 2), keepdims=True)
+    std = mel_db.std(axis=(1, 2), keepdims=True)
+    mel_db -= mean
+    mel_db /= std + EPS
+    return mel_db
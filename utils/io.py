@@ -1,6 +1,7 @@
 # utils/io.py
 
 import json
+import numpy as np
 from config import CLASS_NAMES, WINDOW_SEC, HOP_SEC
 
 def intensity_to_json(
@@ -21,6 +22,10 @@ def intensity_to_json(
     Returns:
         Dictionary in JSON format
     """
+    # Convert to Python floats in bulk rather than one float() per value
+    times = np.asarray(times, dtype=float).tolist()
+    rows = np.asarray(intensities, dtype=float).tolist()
+    
     return {
         "audio_file": wav_name,
         "segment_duration_sec": WINDOW_SEC,
@@ -30,13 +35,7 @@ def intensity_to_json(
         "threshold": threshold,
         "classes": CLASS_NAMES,
         "timeline": [
-            {
-                "time_sec": float(t),
-                "intensity": {
-                    cls: float(vals[i])
-                    for i, cls in enumerate(CLASS_NAMES)
-                }
-            }
-            for t, vals in zip(times, intensities)
+            {"time_sec": t, "intensity": dict(zip(CLASS_NAMES, row))}
+            for t, row in zip(times, rows)
         ]
     }
\ No newline at end of file
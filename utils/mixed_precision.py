@@ -0,0 +1,46 @@
+# utils/mixed_precision.py
+
+
+def _output_layer_names(config):
+    """
+    Names of the layers producing a Keras model's outputs
+
+    Functional models list them in config["output_layers"], as
+    [name, node_index, tensor_index] entries (a single flat entry for a
+    single output in Keras 3). Sequential models have no such key: their
+    output is the last layer.
+    """
+    outputs = config.get("output_layers")
+    if outputs is None:
+        return {config["layers"][-1]["config"]["name"]}
+    if outputs and isinstance(outputs[0], str):
+        outputs = [outputs]
+    return {output[0] for output in outputs}
+
+
+def to_mixed_float16(keras_model):
+    """
+    Rebuild a Keras model to compute in float16, keeping float32 weights and output
+
+    Args:
+        keras_model: Sequential or functional Keras model
+
+    Returns:
+        New model with the same weights, where every layer except the
+        output layers uses the mixed_float16 policy
+    """
+    config = keras_model.get_config()
+
+    # The output layers stay float32 so sigmoid scores keep full precision
+    output_names = _output_layer_names(config)
+    for layer in config["layers"]:
+        if (
+            "dtype" in layer["config"]
+            and layer["class_name"] != "InputLayer"
+            and layer["config"]["name"] not in output_names
+        ):
+            layer["config"]["dtype"] = "mixed_float16"
+
+    mixed_model = type(keras_model).from_config(config)
+    mixed_model.set_weights(keras_model.get_weights())
+    return mixed_model
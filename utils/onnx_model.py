@@ -0,0 +1,70 @@
+# utils/onnx_model.py
+
+import numpy as np
+
+
+class OnnxModel:
+    """
+    Callable wrapper around an ONNX Runtime inference session
+
+    Mirrors `model(inputs, training=False)` so it can stand in for the
+    Keras model behind BatchedPredictor. The session is created with all
+    graph optimizations enabled (constant folding, conv/batch-norm/
+    activation fusion) on the CPU execution provider.
+    """
+
+    def __init__(self, model_path, num_threads=None):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+
+        self.session = ort.InferenceSession(
+            model_path,
+            options,
+            providers=["CPUExecutionProvider"]
+        )
+        self._input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, inputs, training=False):
+        inputs = np.asarray(inputs, dtype=np.float32)
+        return self.session.run(None, {self._input_name: inputs})[0]
+
+
+def convert_keras_to_onnx(keras_path, onnx_path, opset=17):
+    """
+    Convert a Keras .h5 model to ONNX (run once, offline)
+
+    Args:
+        keras_path: Path to the Keras model
+        onnx_path: Where to write the .onnx file
+        opset: ONNX opset version
+    """
+    import tensorflow as tf
+    import tf2onnx
+    from config import N_MELS, TARGET_FRAMES
+
+    model = tf.keras.models.load_model(keras_path, compile=False)
+    input_signature = [
+        tf.TensorSpec((None, N_MELS, TARGET_FRAMES, 1), tf.float32, name="input")
+    ]
+    tf2onnx.convert.from_keras(
+        model,
+        input_signature=input_signature,
+        opset=opset,
+        output_path=onnx_path
+    )
+
+
+if __name__ == "__main__":
+    # python -m utils.onnx_model
+    import os
+
+    model_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "model")
+
+    convert_keras_to_onnx(
+        os.path.join(model_dir, "best_l2_regularized_model.h5"),
+        os.path.join(model_dir, "instrunet.onnx")
+    )
@@ -7,27 +7,167 @@ from reportlab.platypus import (
     Spacer, PageBreak, Image
 )
 from reportlab.lib.enums import TA_CENTER
+from copy import copy
 from datetime import datetime
 from io import BytesIO
-import tempfile
+from operator import itemgetter
 
 from config import CLASS_DISPLAY_NAMES
 
 
+# Paragraph styles, built once at import
+STYLES = getSampleStyleSheet()
+
+TITLE_STYLE = ParagraphStyle(
+    'CustomTitle',
+    parent=STYLES['Heading1'],
+    fontSize=28,
+    textColor=colors.HexColor('#667eea'),
+    spaceAfter=6,
+    alignment=TA_CENTER,
+    fontName='Helvetica-Bold'
+)
+
+SUBTITLE_STYLE = ParagraphStyle(
+    'CustomSubtitle',
+    parent=STYLES['Normal'],
+    fontSize=14,
+    textColor=colors.HexColor('#6b7280'),
+    spaceAfter=20,
+    alignment=TA_CENTER,
+    fontName='Helvetica'
+)
+
+HEADING2_STYLE = ParagraphStyle(
+    'CustomHeading2',
+    parent=STYLES['Heading2'],
+    fontSize=18,
+    textColor=colors.HexColor('#1f2937'),
+    spaceAfter=12,
+    spaceBefore=20,
+    fontName='Helvetica-Bold',
+    backColor=colors.HexColor('#f0f9ff'),
+    leftIndent=10
+)
+
+HEADING3_STYLE = ParagraphStyle(
+    'CustomHeading3',
+    parent=STYLES['Heading3'],
+    fontSize=14,
+    textColor=colors.HexColor('#374151'),
+    spaceAfter=10,
+    spaceBefore=15,
+    fontName='Helvetica-Bold'
+)
+
+BODY_STYLE = ParagraphStyle(
+    'CustomBody',
+    parent=STYLES['Normal'],
+    fontSize=11,
+    textColor=colors.HexColor('#4b5563'),
+    spaceAfter=8,
+    leading=14
+)
+
+# Shared by every table with a coloured header row
+HEADER_TABLE_STYLE = TableStyle([
+    ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#e5e7eb')),
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#667eea')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+    ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+])
+
+METADATA_TABLE_STYLE = TableStyle([
+    ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#e5e7eb')),
+    ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor('#f9fafb')),
+    ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+    ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
+    ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
+    ('ALIGN', (1, 0), (1, -1), 'LEFT'),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('PADDING', (0, 0), (-1, -1), 10),
+])
+
+SETTINGS_TABLE_STYLE = TableStyle([
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+], parent=HEADER_TABLE_STYLE)
+
+INSTRUMENTS_TABLE_STYLE = TableStyle([
+    ('ALIGN', (0, 1), (-1, -1), 'CENTER'),
+], parent=HEADER_TABLE_STYLE)
+
+# Static methodology text, parsed into paragraphs once. Reports lay out
+# shallow copies so concurrent builds never share layout state
+METHODOLOGY_TEXT = (
+    "InstruNet AI employs a deep Convolutional Neural Network (CNN) "
+    "specifically designed for multi-label music instrument recognition "
+    "using log-scaled mel-spectrogram representations of audio signals.",
+
+    "The input to the network is a two-dimensional mel-spectrogram treated "
+    "as a single-channel image, preserving both temporal and spectral "
+    "characteristics of the audio. The architecture consists of four "
+    "hierarchical convolutional blocks with increasing filter depths of "
+    "32, 64, 128, and 256 respectively. Each convolution uses a 5×5 kernel "
+    "with same padding and ReLU activation, enabling the network to capture "
+    "broad time–frequency patterns such as harmonic structures, timbral "
+    "textures, and transient events.",
+
+    "Each convolutional layer is followed by Batch Normalization to stabilize "
+    "training and improve convergence. MaxPooling layers are applied after "
+    "the first three convolutional blocks to progressively reduce spatial "
+    "resolution while retaining salient features. The final convolutional "
+    "block omits pooling to preserve high-level feature maps prior to global "
+    "aggregation.",
+
+    "Global Average Pooling is employed instead of fully connected layers, "
+    "significantly reducing the number of trainable parameters and improving "
+    "generalization. This design choice forces the network to learn "
+    "class-specific activation maps rather than memorizing spatial positions. "
+    "A Dropout layer with a rate of 0.4 is applied to further mitigate "
+    "overfitting.",
+
+    "The output layer consists of a dense layer with sigmoid activation, "
+    "producing independent probability scores for each instrument class. "
+    "This formulation supports multi-label classification, allowing multiple "
+    "instruments to be detected simultaneously within the same audio segment.",
+
+    "L2 weight regularization (λ = 1e-4) is applied to all convolutional and "
+    "output layers to penalize large weights and enhance robustness. The model "
+    "is trained using Stochastic Gradient Descent (SGD) with a learning rate of "
+    "0.01, momentum of 0.9, and Nesterov acceleration. Binary cross-entropy is "
+    "used as the loss function, and training is controlled using Early "
+    "Stopping, learning rate reduction on plateau, and best-model checkpointing "
+    "based on validation loss.",
+)
+
+METHODOLOGY_PARAGRAPHS = tuple(Paragraph(text, BODY_STYLE) for text in METHODOLOGY_TEXT)
+
+PROCESS_DATA = [
+    ['Step', 'Description'],
+    ['1', 'Segmentation'],
+    ['2', 'Feature Extraction'],
+    ['3', 'Model Prediction'],
+    ['4', 'Temporal Smoothing'],
+    ['5', 'Aggregation'],
+]
+
+
 def generate_pdf_report(audio_name, aggregation, threshold, smoothing,
                         confidence_dict, visualizations):
     """
-    Generate a professional PDF report
+    Generate a professional PDF report and return it as bytes
+
+    visualizations maps 'waveform', 'mel_spec' and 'timeline' to PNG bytes
     """
 
-    # Create temp file for PDF
-    pdf_file = tempfile.NamedTemporaryFile(delete=False, suffix='.pdf')
-    pdf_path = pdf_file.name
-    pdf_file.close()
+    # Build the PDF in memory
+    pdf_buf = BytesIO()
 
     # Create PDF document
     doc = SimpleDocTemplate(
-        pdf_path,
+        pdf_buf,
         pagesize=letter,
         rightMargin=0.75 * inch,
         leftMargin=0.75 * inch,
@@ -37,93 +177,32 @@ def generate_pdf_report(audio_name, aggregation, threshold, smoothing,
 
     elements = []
 
-    # Styles
-    styles = getSampleStyleSheet()
-
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=28,
-        textColor=colors.HexColor('#667eea'),
-        spaceAfter=6,
-        alignment=TA_CENTER,
-        fontName='Helvetica-Bold'
-    )
-
-    subtitle_style = ParagraphStyle(
-        'CustomSubtitle',
-        parent=styles['Normal'],
-        fontSize=14,
-        textColor=colors.HexColor('#6b7280'),
-        spaceAfter=20,
-        alignment=TA_CENTER,
-        fontName='Helvetica'
-    )
-
-    heading2_style = ParagraphStyle(
-        'CustomHeading2',
-        parent=styles['Heading2'],
-        fontSize=18,
-        textColor=colors.HexColor('#1f2937'),
-        spaceAfter=12,
-        spaceBefore=20,
-        fontName='Helvetica-Bold',
-        backColor=colors.HexColor('#f0f9ff'),
-        leftIndent=10
-    )
-
-    heading3_style = ParagraphStyle(
-        'CustomHeading3',
-        parent=styles['Heading3'],
-        fontSize=14,
-        textColor=colors.HexColor('#374151'),
-        spaceAfter=10,
-        spaceBefore=15,
-        fontName='Helvetica-Bold'
-    )
-
-    body_style = ParagraphStyle(
-        'CustomBody',
-        parent=styles['Normal'],
-        fontSize=11,
-        textColor=colors.HexColor('#4b5563'),
-        spaceAfter=8,
-        leading=14
-    )
-
     # ================= PAGE 1 =================
 
     elements.append(Spacer(1, 0.15 * inch))
-    elements.append(Paragraph("🎵 InstruNet AI", title_style))
-    elements.append(Paragraph("Instrument Recognition Analysis Report", subtitle_style))
+    elements.append(Paragraph("🎵 InstruNet AI", TITLE_STYLE))
+    elements.append(Paragraph("Instrument Recognition Analysis Report", SUBTITLE_STYLE))
 
-    current_time = datetime.now().strftime("%B %d, %Y at %I:%M %p")
+    # One clock read, so both fields always agree
+    now = datetime.now()
+    current_time = now.strftime("%B %d, %Y at %I:%M %p")
 
     metadata_data = [
         ['Generated:', current_time],
         ['Audio File:', audio_name],
-        ['Analysis Date:', datetime.now().strftime("%Y-%m-%d")]
+        ['Analysis Date:', now.strftime("%Y-%m-%d")]
     ]
 
     metadata_table = Table(metadata_data, colWidths=[2 * inch, 4 * inch])
 
-    metadata_table.setStyle(TableStyle([
-        ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#e5e7eb')),
-        ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor('#f9fafb')),
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
-        ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
-        ('ALIGN', (1, 0), (1, -1), 'LEFT'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('PADDING', (0, 0), (-1, -1), 10),
-    ]))
+    metadata_table.setStyle(METADATA_TABLE_STYLE)
 
     elements.append(metadata_table)
     elements.append(Spacer(1, 0.3 * inch))
 
     # ================= SETTINGS =================
 
-    elements.append(Paragraph("⚙️ Analysis Configuration", heading2_style))
+    elements.append(Paragraph("⚙️ Analysis Configuration", HEADING2_STYLE))
     elements.append(Spacer(1, 0.1 * inch))
 
     settings_data = [
@@ -141,59 +220,47 @@ def generate_pdf_report(audio_name, aggregation, threshold, smoothing,
         colWidths=[1.8 * inch, 1.5 * inch, 3.2 * inch]
     )
 
-    settings_table.setStyle(TableStyle([
-        ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#e5e7eb')),
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#667eea')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-        ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-    ]))
+    settings_table.setStyle(SETTINGS_TABLE_STYLE)
 
     elements.append(settings_table)
     elements.append(Spacer(1, 0.3 * inch))
 
     # ================= SUMMARY =================
 
-    elements.append(Paragraph("🎼 Detection Summary", heading2_style))
+    elements.append(Paragraph("🎼 Detection Summary", HEADING2_STYLE))
     elements.append(Spacer(1, 0.1 * inch))
 
     if confidence_dict:
 
+        # One sort serves the summary extremes and the instruments table
         sorted_instruments = sorted(
             confidence_dict.items(),
-            key=lambda x: x[1],
+            key=itemgetter(1),
             reverse=True
         )
 
-        avg_conf = sum(confidence_dict.values()) / len(confidence_dict)
+        highest_conf = sorted_instruments[0][1]
+        lowest_conf = sorted_instruments[-1][1]
+        avg_conf = sum(conf for _, conf in sorted_instruments) / len(sorted_instruments)
 
         summary_data = [
             ['Metric', 'Value'],
             ['Total Instruments', str(len(confidence_dict))],
             ['Average Confidence', f'{avg_conf * 100:.1f}%'],
-            ['Highest Confidence', f'{max(confidence_dict.values()) * 100:.1f}%'],
-            ['Lowest Confidence', f'{min(confidence_dict.values()) * 100:.1f}%']
+            ['Highest Confidence', f'{highest_conf * 100:.1f}%'],
+            ['Lowest Confidence', f'{lowest_conf * 100:.1f}%']
         ]
 
         summary_table = Table(summary_data, colWidths=[3 * inch, 3.5 * inch])
 
-        summary_table.setStyle(TableStyle([
-            ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#e5e7eb')),
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#667eea')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-        ]))
+        summary_table.setStyle(HEADER_TABLE_STYLE)
 
         elements.append(summary_table)
         elements.append(Spacer(1, 0.3 * inch))
 
         # ================= INSTRUMENTS =================
 
-        elements.append(Paragraph("✅ Detected Instruments", heading2_style))
+        elements.append(Paragraph("✅ Detected Instruments", HEADING2_STYLE))
         elements.append(Spacer(1, 0.1 * inch))
 
         instruments_data = [['Rank', 'Instrument', 'Confidence', 'Status']]
@@ -213,60 +280,45 @@ def generate_pdf_report(audio_name, aggregation, threshold, smoothing,
             colWidths=[0.7 * inch, 2.5 * inch, 1.5 * inch, 1.8 * inch]
         )
 
-        instruments_table.setStyle(TableStyle([
-            ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#e5e7eb')),
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#667eea')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-            ('ALIGN', (0, 1), (-1, -1), 'CENTER'),
-        ]))
+        instruments_table.setStyle(INSTRUMENTS_TABLE_STYLE)
 
         elements.append(instruments_table)
 
     else:
 
         elements.append(
-            Paragraph("⚠️ No instruments detected.", body_style)
+            Paragraph("⚠️ No instruments detected.", BODY_STYLE)
         )
 
     # ================= PAGE 2 =================
 
     elements.append(PageBreak())
 
-    elements.append(Paragraph("📊 Visualizations", heading2_style))
+    elements.append(Paragraph("📊 Visualizations", HEADING2_STYLE))
     elements.append(Spacer(1, 0.2 * inch))
 
+    # Images use lazy=2: each PNG is decoded only when its page is drawn and
+    # released right after, so at most one decoded bitmap is alive at a time
+
     # -------- Waveform --------
 
     if 'waveform' in visualizations:
 
-        elements.append(Paragraph("Audio Waveform", heading3_style))
+        elements.append(Paragraph("Audio Waveform", HEADING3_STYLE))
 
         elements.append(Paragraph(
             "Time-domain representation of the original audio signal. "
             "This shows amplitude variations across time.",
-            body_style
+            BODY_STYLE
         ))
 
         elements.append(Spacer(1, 0.1 * inch))
 
-        waveform_fig = visualizations['waveform']
-
-        waveform_buf = BytesIO()
-        waveform_fig.savefig(
-            waveform_buf,
-            format='png',
-            dpi=150,
-            bbox_inches='tight'
-        )
-        waveform_buf.seek(0)
-
         waveform_img = Image(
-            waveform_buf,
+            BytesIO(visualizations['waveform']),
             width=6.5 * inch,
-            height=2.0 * inch
+            height=2.0 * inch,
+            lazy=2
         )
 
         elements.append(waveform_img)
@@ -277,25 +329,24 @@ def generate_pdf_report(audio_name, aggregation, threshold, smoothing,
 
     if 'mel_spec' in visualizations:
 
-        elements.append(Paragraph("Mel Spectrogram", heading3_style))
+        elements.append(Paragraph("Mel Spectrogram", HEADING3_STYLE))
 
         elements.append(Paragraph(
             "Frequency-domain representation of the audio signal converted into "
             "mel-scaled bands. This visualization is used as the primary input "
             "feature for the CNN model, where brighter regions indicate higher "
             "energy concentrations at specific frequencies and time intervals.",
-            body_style
+            BODY_STYLE
         ))
 
         elements.append(Spacer(1, 0.1 * inch))
 
-        mel_fig = visualizations['mel_spec']
-
-        mel_buf = BytesIO()
-        mel_fig.savefig(mel_buf, format='png', dpi=150, bbox_inches='tight')
-        mel_buf.seek(0)
-
-        mel_img = Image(mel_buf, width=6.5 * inch, height=2.5 * inch)
+        mel_img = Image(
+            BytesIO(visualizations['mel_spec']),
+            width=6.5 * inch,
+            height=2.5 * inch,
+            lazy=2
+        )
 
         elements.append(mel_img)
         elements.append(Spacer(1, 0.3 * inch))
@@ -304,138 +355,49 @@ def generate_pdf_report(audio_name, aggregation, threshold, smoothing,
 
     if 'timeline' in visualizations:
         
-        elements.append(Paragraph("Instrument Intensity Timeline", heading3_style))
+        elements.append(Paragraph("Instrument Intensity Timeline", HEADING3_STYLE))
 
         elements.append(Paragraph(
             "Temporal representation of confidence scores for detected instruments "
             "across the audio duration. Each curve indicates the probability of an "
             "instrument being present over time, while the dashed line represents "
             "the detection threshold used for final classification.",
-            body_style
+            BODY_STYLE
         ))
 
         elements.append(Spacer(1, 0.1 * inch))
 
-        timeline_fig = visualizations['timeline']
-
-
-        timeline_buf = BytesIO()
-        timeline_fig.savefig(timeline_buf, format='png', dpi=150, bbox_inches='tight')
-        timeline_buf.seek(0)
-
         timeline_img = Image(
-            timeline_buf,
+            BytesIO(visualizations['timeline']),
             width=6.5 * inch,
-            height=3.5 * inch
+            height=3.5 * inch,
+            lazy=2
         )
 
         elements.append(timeline_img)
 
     # ================= PAGE 3 =================
 
-    elements.append(Paragraph("🔬 Methodology & Interpretation", heading2_style))
+    elements.append(Paragraph("🔬 Methodology & Interpretation", HEADING2_STYLE))
     elements.append(Spacer(1, 0.2 * inch))
 
-    elements.append(Paragraph("Model Architecture", heading3_style))
-
-    elements.append(Paragraph(
-        "InstruNet AI employs a deep Convolutional Neural Network (CNN) "
-        "specifically designed for multi-label music instrument recognition "
-        "using log-scaled mel-spectrogram representations of audio signals.",
-        body_style
-    ))
-
-    elements.append(Paragraph(
-        "The input to the network is a two-dimensional mel-spectrogram treated "
-        "as a single-channel image, preserving both temporal and spectral "
-        "characteristics of the audio. The architecture consists of four "
-        "hierarchical convolutional blocks with increasing filter depths of "
-        "32, 64, 128, and 256 respectively. Each convolution uses a 5×5 kernel "
-        "with same padding and ReLU activation, enabling the network to capture "
-        "broad time–frequency patterns such as harmonic structures, timbral "
-        "textures, and transient events.",
-        body_style
-    ))
-
-    elements.append(Paragraph(
-        "Each convolutional layer is followed by Batch Normalization to stabilize "
-        "training and improve convergence. MaxPooling layers are applied after "
-        "the first three convolutional blocks to progressively reduce spatial "
-        "resolution while retaining salient features. The final convolutional "
-        "block omits pooling to preserve high-level feature maps prior to global "
-        "aggregation.",
-        body_style
-    ))
-
-    elements.append(Paragraph(
-        "Global Average Pooling is employed instead of fully connected layers, "
-        "significantly reducing the number of trainable parameters and improving "
-        "generalization. This design choice forces the network to learn "
-        "class-specific activation maps rather than memorizing spatial positions. "
-        "A Dropout layer with a rate of 0.4 is applied to further mitigate "
-        "overfitting.",
-        body_style
-    ))
-
-    elements.append(Paragraph(
-        "The output layer consists of a dense layer with sigmoid activation, "
-        "producing independent probability scores for each instrument class. "
-        "This formulation supports multi-label classification, allowing multiple "
-        "instruments to be detected simultaneously within the same audio segment.",
-        body_style
-    ))
-
-    elements.append(Paragraph(
-        "L2 weight regularization (λ = 1e-4) is applied to all convolutional and "
-        "output layers to penalize large weights and enhance robustness. The model "
-        "is trained using Stochastic Gradient Descent (SGD) with a learning rate of "
-        "0.01, momentum of 0.9, and Nesterov acceleration. Binary cross-entropy is "
-        "used as the loss function, and training is controlled using Early "
-        "Stopping, learning rate reduction on plateau, and best-model checkpointing "
-        "based on validation loss.",
-        body_style
-    ))
+    elements.append(Paragraph("Model Architecture", HEADING3_STYLE))
 
-    elements.append(Spacer(1, 0.2 * inch))
+    elements.extend(copy(paragraph) for paragraph in METHODOLOGY_PARAGRAPHS)
 
-    elements.append(Paragraph("Analysis Process", heading3_style))
+    elements.append(Spacer(1, 0.2 * inch))
 
-    process_data = [
-        ['Step', 'Description'],
-        ['1', 'Segmentation'],
-        ['2', 'Feature Extraction'],
-        ['3', 'Model Prediction'],
-        ['4', 'Temporal Smoothing'],
-        ['5', 'Aggregation'],
-    ]
+    elements.append(Paragraph("Analysis Process", HEADING3_STYLE))
 
-    process_table = Table(process_data, colWidths=[1.2 * inch, 5.3 * inch])
+    process_table = Table(PROCESS_DATA, colWidths=[1.2 * inch, 5.3 * inch])
 
-    process_table.setStyle(TableStyle([
-        ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#e5e7eb')),
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#667eea')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-        ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-    ]))
+    process_table.setStyle(HEADER_TABLE_STYLE)
 
     elements.append(process_table)
     elements.append(Spacer(1, 0.3 * inch))
 
-    # ================= FOOTER =================
-
-    footer_style = ParagraphStyle(
-        'Footer',
-        parent=styles['Normal'],
-        fontSize=9,
-        textColor=colors.HexColor('#9ca3af'),
-        alignment=TA_CENTER,
-        fontName='Helvetica-Oblique'
-    )
-
     # ================= BUILD =================
 
     doc.build(elements)
 
-    return pdf_path
+    return pdf_buf.getvalue()
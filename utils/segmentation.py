@@ -1,7 +1,21 @@
+import threading
+
 import numpy as np
 from config import TARGET_SR, WINDOW_SEC, HOP_SEC
 
-def sliding_windows(audio, sr=TARGET_SR, window_sec=WINDOW_SEC, hop_sec=HOP_SEC):
+# Per-thread scratch buffers for reuse_buffer=True
+_scratch = threading.local()
+
+def _padded_buffer(size, dtype):
+    """First `size` samples of this thread's scratch buffer, grown geometrically"""
+    buf = getattr(_scratch, "buf", None)
+    if buf is None or buf.dtype != dtype:
+        buf = _scratch.buf = np.zeros(size, dtype=dtype)
+    elif len(buf) < size:
+        buf = _scratch.buf = np.zeros(max(size, 2 * len(buf)), dtype=dtype)
+    return buf[:size]
+
+def sliding_windows(audio, sr=TARGET_SR, window_sec=WINDOW_SEC, hop_sec=HOP_SEC, reuse_buffer=False):
     """
     Create sliding windows from audio
     
@@ -10,31 +24,34 @@ def sliding_windows(audio, sr=TARGET_SR, window_sec=WINDOW_SEC, hop_sec=HOP_SEC)
         sr: Sample rate
         window_sec: Window duration in seconds
         hop_sec: Hop duration in seconds
+        reuse_buffer: Pad into a per-thread scratch buffer instead of a fresh
+            allocation. The returned segments then stay valid only until the
+            next reuse_buffer call on the same thread
     
     Returns:
-        segments: List of audio segments
-        times: List of start times for each segment
+        segments: Read-only (n_segments, window_samples) view of the audio
+        times: float64 array of start times for each segment in seconds
     """
+    audio = np.asarray(audio)
     window_samples = int(window_sec * sr)
     hop_samples = int(hop_sec * sr)
     
-    segments = []
-    times = []
+    if len(audio) == 0:
+        return np.empty((0, window_samples), dtype=audio.dtype), np.empty(0)
+    
+    # Windows start every hop until one reaches the end of the audio
+    n_segments = max(0, -(-(len(audio) - window_samples) // hop_samples)) + 1
+    
+    # Zero-pad the tail once so the last window is full length
+    padded_len = (n_segments - 1) * hop_samples + window_samples
+    if reuse_buffer:
+        padded = _padded_buffer(padded_len, audio.dtype)
+        padded[len(audio):] = 0
+    else:
+        padded = np.zeros(padded_len, dtype=audio.dtype)
+    padded[:len(audio)] = audio
     
-    for start in range(0, len(audio), hop_samples):
-        end = start + window_samples
-        
-        if end > len(audio):
-            # Pad last segment if needed
-            segment = np.pad(audio[start:], (0, end - len(audio)), mode='constant')
-        else:
-            segment = audio[start:end]
-        
-        segments.append(segment)
-        times.append(start / sr)
-        
-        # Break if we've processed the whole audio
-        if end >= len(audio):
-            break
+    segments = np.lib.stride_tricks.sliding_window_view(padded, window_samples)[::hop_samples][:n_segments]
+    times = np.arange(n_segments) * (hop_samples / sr)
     
-    return segments, times
\ No newline at end of file
+    return segments, times
@@ -0,0 +1,127 @@
+# utils/tflite_model.py
+
+import numpy as np
+
+
+def _interpreter_class():
+    """Prefer the standalone tflite-runtime package, fall back to TensorFlow"""
+    try:
+        from tflite_runtime.interpreter import Interpreter
+    except ImportError:
+        import tensorflow as tf
+        Interpreter = tf.lite.Interpreter
+    return Interpreter
+
+
+class TFLiteModel:
+    """
+    Callable wrapper around a TFLite interpreter
+
+    Mirrors `model(inputs, training=False)` so it can stand in for the
+    Keras model behind BatchedPredictor. Fully int8-quantized models are
+    handled transparently: float inputs are quantized and outputs are
+    dequantized with the scales stored in the model. The interpreter is
+    not thread safe; BatchedPredictor only calls it from its single
+    worker thread.
+    """
+
+    def __init__(self, model_path, num_threads=None, batch_size=None):
+        self.interpreter = _interpreter_class()(
+            model_path=model_path,
+            num_threads=num_threads
+        )
+
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+
+        # Size the input for the batch size callers will use (e.g.
+        # BatchedPredictor's padded batches) so tensors are allocated once
+        if batch_size is not None and batch_size != self._input["shape"][0]:
+            self.interpreter.resize_tensor_input(
+                self._input["index"], [batch_size, *self._input["shape"][1:]]
+            )
+        self.interpreter.allocate_tensors()
+        self._batch_size = batch_size if batch_size is not None else self._input["shape"][0]
+
+    def __call__(self, inputs, training=False):
+        inputs = np.asarray(inputs, dtype=np.float32)
+
+        # Resize only when the batch size changes between calls
+        if inputs.shape[0] != self._batch_size:
+            self.interpreter.resize_tensor_input(self._input["index"], inputs.shape)
+            self.interpreter.allocate_tensors()
+            self._batch_size = inputs.shape[0]
+
+        self.interpreter.set_tensor(self._input["index"], _quantize(inputs, self._input))
+        self.interpreter.invoke()
+        return _dequantize(self.interpreter.get_tensor(self._output["index"]), self._output)
+
+
+def _quantize(x, details):
+    scale, zero_point = details["quantization"]
+    if not scale:
+        return x.astype(details["dtype"])
+    info = np.iinfo(details["dtype"])
+    return np.clip(np.round(x / scale + zero_point), info.min, info.max).astype(details["dtype"])
+
+
+def _dequantize(x, details):
+    scale, zero_point = details["quantization"]
+    if not scale:
+        return x
+    return (x.astype(np.float32) - zero_point) * scale
+
+
+def convert_keras_to_tflite(keras_path, tflite_path, quantize=True, representative_inputs=None):
+    """
+    Convert a Keras .h5 model to TFLite (run once, offline)
+
+    Args:
+        keras_path: Path to the Keras model
+        tflite_path: Where to write the .tflite file
+        quantize: Apply dynamic-range (int8 weight) quantization
+        representative_inputs: Optional float32 batch of real model inputs.
+            When given, the model is fully int8-quantized (weights,
+            activations and I/O) using these samples for calibration.
+    """
+    import tensorflow as tf
+
+    model = tf.keras.models.load_model(keras_path, compile=False)
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if quantize or representative_inputs is not None:
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+
+    if representative_inputs is not None:
+        def representative_dataset():
+            for x in representative_inputs:
+                yield [x[np.newaxis].astype(np.float32)]
+
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        converter.inference_input_type = tf.int8
+        converter.inference_output_type = tf.int8
+
+    with open(tflite_path, "wb") as f:
+        f.write(converter.convert())
+
+
+if __name__ == "__main__":
+    # python -m utils.tflite_model [calibration.wav ...]
+    import os
+    import sys
+
+    model_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "model")
+
+    representative_inputs = None
+    if len(sys.argv) > 1:
+        from pipeline import segment_audio, segments_to_inputs
+
+        representative_inputs = np.concatenate([
+            segments_to_inputs(segment_audio(path)[0]) for path in sys.argv[1:]
+        ])
+
+    convert_keras_to_tflite(
+        os.path.join(model_dir, "best_l2_regularized_model.h5"),
+        os.path.join(model_dir, "instrunet.tflite"),
+        representative_inputs=representative_inputs
+    )
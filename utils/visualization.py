@@ -1,10 +1,108 @@
 # utils/visualization.py
 
+from contextlib import contextmanager
+from functools import lru_cache
+import gc
+
 import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection
+from matplotlib.figure import Figure
+from matplotlib.lines import Line2D
 import numpy as np
 import librosa.display
 from config import CLASS_NAMES, CLASS_DISPLAY_NAMES
 
+# Class code -> column in the model output
+CLASS_INDEX = {cls: i for i, cls in enumerate(CLASS_NAMES)}
+
+# RGBA palette for timeline curves, sampled once at import
+_TAB10 = plt.cm.tab10(np.linspace(0, 1, 10))
+
+@lru_cache(maxsize=8)
+def _display_names(class_names):
+    """Display names for a tuple of class codes, built once per tuple"""
+    return tuple(CLASS_DISPLAY_NAMES.get(cls, cls.upper()) for cls in class_names)
+
+# Display names aligned with CLASS_NAMES / CLASS_INDEX
+_DISPLAY_NAMES = _display_names(tuple(CLASS_NAMES))
+
+def _class_major(intensities):
+    """
+    (n_classes, n_segments) C-contiguous float32 copy of an (n_segments,
+    n_classes) intensity array, so each class curve is one contiguous row.
+    Probabilities plotted at screen resolution do not need float64
+    """
+    return np.ascontiguousarray(np.asarray(intensities).T, dtype=np.float32)
+
+def _class_lines(times, class_major, class_indices):
+    """
+    Stack per-class intensity curves as (n_lines, n_times, 2) vertices for
+    a single LineCollection
+    """
+    times = np.asarray(times, dtype=float)
+    lines = np.empty((len(class_indices), len(times), 2))
+    lines[:, :, 0] = times
+    lines[:, :, 1] = class_major[class_indices]
+    return lines
+
+def _downsample_for_display(times, class_major, target_pts=2000, reduce="minmax"):
+    """
+    Bin class-major intensities along time so a plot receives about as many
+    points as it has pixels
+    
+    Args:
+        times: Array of time points
+        class_major: Array of shape (n_classes, n_segments)
+        target_pts: Maximum number of points per class to return
+        reduce: "minmax" keeps each bin's min and max (interleaved, for line
+            plots, so peaks survive); "mean" keeps one averaged column per
+            bin (for heatmaps)
+    
+    Returns:
+        times: Time point of each returned column
+        class_major: Array of shape (n_classes, <= target_pts)
+    """
+    times = np.asarray(times, dtype=float)
+    n_bins = target_pts // 2 if reduce == "minmax" else target_pts
+    n = len(times)
+    if n <= target_pts or n_bins < 1:
+        return times, class_major
+    
+    # Bin start indices; reduceat also covers the shorter tail bin
+    starts = np.arange(0, n, -(-n // n_bins))
+    if reduce == "minmax":
+        binned = np.empty((len(class_major), len(starts), 2), dtype=class_major.dtype)
+        binned[:, :, 0] = np.minimum.reduceat(class_major, starts, axis=1)
+        binned[:, :, 1] = np.maximum.reduceat(class_major, starts, axis=1)
+        return np.repeat(times[starts], 2), binned.reshape(len(class_major), -1)
+    if reduce == "mean":
+        counts = np.diff(np.append(starts, n))
+        sums = np.add.reduceat(class_major, starts, axis=1)
+        sums /= counts.astype(sums.dtype)
+        return times[starts], sums
+    raise ValueError(f"Unknown reduce method: {reduce}")
+
+def waveform_envelope(audio, target_pts=4000):
+    """
+    Reduce a waveform to interleaved per-bucket min/max values for plotting.
+
+    A ~1200 px wide plot cannot show more detail than this, and drawing
+    the envelope instead of every sample keeps matplotlib fast.
+
+    Args:
+        audio (np.ndarray): Audio signal
+        target_pts (int): Number of buckets (the envelope has twice as many points)
+
+    Returns:
+        np.ndarray
+    """
+    n = len(audio)
+    if n <= target_pts:
+        return audio
+    k = n // target_pts
+    buckets = audio[:k * target_pts].reshape(-1, k)
+    return np.stack([buckets.min(axis=1), buckets.max(axis=1)], axis=1).ravel()
+
 def plot_waveform(audio, sr):
     """
     Plot the raw audio waveform (time-domain representation).
@@ -16,7 +114,8 @@ def plot_waveform(audio, sr):
     Returns:
         matplotlib.figure.Figure
     """
-    fig, ax = plt.subplots(figsize=(12, 3))
+    fig = Figure(figsize=(12, 3), layout="constrained")
+    ax = fig.subplots()
 
     librosa.display.waveshow(
         audio,
@@ -36,25 +135,41 @@ def plot_waveform(audio, sr):
 
     ax.grid(True, alpha=0.3, linestyle=":")
 
-    plt.tight_layout()
     return fig
     
 def plot_intensity(times, intensities, threshold):
     """
     Basic intensity plot for all instruments
     """
-    plt.figure(figsize=(12, 4))
-    for i, cls in enumerate(CLASS_NAMES):
-        plt.plot(times, intensities[:, i], label=cls, alpha=0.7)
-    plt.axhline(threshold, linestyle="--", color="red", alpha=0.4, label="Threshold")
-    plt.xlabel("Time (sec)")
-    plt.ylabel("Intensity")
-    plt.legend(ncol=4, fontsize=8)
-    plt.tight_layout()
-    return plt.gcf()
+    fig = Figure(figsize=(12, 4), layout="constrained")
+    ax = fig.subplots()
+    
+    # All classes as one collection, colored like the default line cycle
+    cycle = plt.rcParams["axes.prop_cycle"].by_key()["color"]
+    line_colors = [cycle[i % len(cycle)] for i in range(len(CLASS_NAMES))]
+    ax.add_collection(LineCollection(
+        _class_lines(times, _class_major(intensities), np.arange(len(CLASS_NAMES))),
+        colors=line_colors,
+        alpha=0.7,
+        rasterized=True
+    ))
+    ax.autoscale_view()
+    
+    threshold_line = ax.axhline(threshold, linestyle="--", color="red", alpha=0.4, label="Threshold")
+    ax.set_xlabel("Time (sec)")
+    ax.set_ylabel("Intensity")
+    
+    # Data-free proxies give the legend one entry per class
+    handles = [
+        Line2D([], [], color=color, alpha=0.7, label=cls)
+        for cls, color in zip(CLASS_NAMES, line_colors)
+    ]
+    ax.legend(handles=handles + [threshold_line], ncol=4, fontsize=8)
+    return fig
 
 
-def create_intensity_timeline(times, intensities, threshold, class_names):
+def create_intensity_timeline(times, intensities, threshold, class_names,
+                              precomputed_max=None, precomputed_detected=None):
     """
     Create a professional instrument intensity timeline visualization
     showing only detected instruments or top instruments
@@ -64,48 +179,78 @@ def create_intensity_timeline(times, intensities, threshold, class_names):
         intensities: Array of shape (n_segments, n_classes)
         threshold: Detection threshold
         class_names: List of class names
+        precomputed_max: Optional per-class peak confidence of shape
+            (n_classes,), if an earlier stage already has it
+        precomputed_detected: Optional indices (or boolean mask) of the
+            classes to draw, bypassing the threshold scan
     
     Returns:
         matplotlib figure
     """
-    # Convert to numpy array if needed
-    intensities = np.array(intensities)
+    # Convert to numpy arrays, holding intensities class-major so each
+    # instrument's curve is a contiguous row
+    intensities = _class_major(intensities)
     times = np.array(times)
     
-    # Find instruments that exceed threshold at any point
-    max_per_class = np.max(intensities, axis=0)
-    detected_indices = np.where(max_per_class >= threshold)[0]
+    # Find instruments that exceed threshold at any point, reusing whatever
+    # the caller already computed
+    max_per_class = precomputed_max
+    if precomputed_detected is None:
+        if max_per_class is None:
+            max_per_class = np.max(intensities, axis=1)
+        detected_indices = np.where(np.asarray(max_per_class) >= threshold)[0]
+    else:
+        detected_indices = np.asarray(precomputed_detected)
+        if detected_indices.dtype == bool:
+            detected_indices = np.flatnonzero(detected_indices)
     
     # If no instruments detected, show top 5
     if len(detected_indices) == 0:
+        if max_per_class is None:
+            max_per_class = np.max(intensities, axis=1)
         top_indices = np.argsort(max_per_class)[-5:]
         detected_indices = top_indices
         title_suffix = " (Top 5 by Peak Confidence)"
     else:
         title_suffix = " (Detected Instruments)"
     
-    # Create figure
-    fig, ax = plt.subplots(figsize=(12, 6))
+    # Create figure outside pyplot's global state so it can be drawn on a
+    # worker thread
+    fig = Figure(figsize=(12, 6), layout="constrained")
+    ax = fig.subplots()
     
     # Color palette
-    colors = plt.cm.tab10(np.linspace(0, 1, 10))
+    colors = _TAB10
     
-    # Plot each detected instrument
-    for idx, class_idx in enumerate(detected_indices):
-        cls = class_names[class_idx]
-        display_name = CLASS_DISPLAY_NAMES.get(cls, cls.upper())
-        
-        ax.plot(
-            times,
-            intensities[:, class_idx],
-            label=display_name,
+    line_colors = colors[np.arange(len(detected_indices)) % len(colors)]
+    
+    # Plot all detected instruments as one LineCollection, binned down to
+    # about the plot's pixel width for long recordings
+    plot_times, plot_curves = _downsample_for_display(times, intensities[detected_indices])
+    ax.add_collection(LineCollection(
+        _class_lines(plot_times, plot_curves, np.arange(len(detected_indices))),
+        colors=line_colors,
+        linewidths=2.5,
+        alpha=0.8,
+        rasterized=True
+    ))
+    ax.autoscale_view()
+    
+    # Data-free proxies give the legend one entry per instrument
+    display_names = _display_names(tuple(class_names))
+    handles = [
+        Line2D(
+            [], [],
+            color=color,
             linewidth=2.5,
             alpha=0.8,
-            color=colors[idx % len(colors)]
+            label=display_names[class_idx]
         )
+        for class_idx, color in zip(detected_indices, line_colors)
+    ]
     
     # Add threshold line
-    ax.axhline(
+    threshold_line = ax.axhline(
         threshold,
         linestyle="--",
         color="red",
@@ -130,6 +275,7 @@ def create_intensity_timeline(times, intensities, threshold, class_names):
     
     # Legend
     ax.legend(
+        handles=handles + [threshold_line],
         loc='upper left',
         bbox_to_anchor=(1.02, 1),
         fontsize=10,
@@ -139,8 +285,6 @@ def create_intensity_timeline(times, intensities, threshold, class_names):
     
     # Set y-axis limits
     ax.set_ylim(-0.05, 1.05)
-    
-    plt.tight_layout()
     return fig
 
 
@@ -157,24 +301,32 @@ def create_multi_instrument_comparison(times, intensities, instruments_to_compar
     Returns:
         matplotlib figure
     """
-    fig, axes = plt.subplots(len(instruments_to_compare), 1, figsize=(12, 3 * len(instruments_to_compare)))
+    fig = Figure(figsize=(12, 3 * len(instruments_to_compare)), layout="constrained")
+    axes = fig.subplots(len(instruments_to_compare), 1)
     
     if len(instruments_to_compare) == 1:
         axes = [axes]
     
-    for idx, instrument in enumerate(instruments_to_compare):
-        class_idx = CLASS_NAMES.index(instrument)
-        display_name = CLASS_DISPLAY_NAMES.get(instrument, instrument.upper())
+    # Gather the compared instruments' curves once, as contiguous rows
+    class_indices = np.fromiter(
+        (CLASS_INDEX[instrument] for instrument in instruments_to_compare),
+        dtype=np.intp,
+        count=len(instruments_to_compare)
+    )
+    curves = _class_major(np.asarray(intensities)[:, class_indices])
+    
+    for idx, (class_idx, curve) in enumerate(zip(class_indices, curves)):
+        display_name = _DISPLAY_NAMES[class_idx]
         
         ax = axes[idx]
         ax.fill_between(
             times,
             0,
-            intensities[:, class_idx],
+            curve,
             alpha=0.3,
             color='blue'
         )
-        ax.plot(times, intensities[:, class_idx], linewidth=2, color='blue')
+        ax.plot(times, curve, linewidth=2, color='blue')
         ax.axhline(threshold, linestyle="--", color="red", alpha=0.6)
         
         ax.set_ylabel("Confidence", fontsize=10)
@@ -184,8 +336,6 @@ def create_multi_instrument_comparison(times, intensities, instruments_to_compar
         
         if idx == len(instruments_to_compare) - 1:
             ax.set_xlabel("Time (seconds)", fontsize=10)
-    
-    plt.tight_layout()
     return fig
 
 
@@ -201,19 +351,25 @@ def create_confidence_heatmap(times, intensities, class_names):
     Returns:
         matplotlib figure
     """
-    fig, ax = plt.subplots(figsize=(12, 8))
+    fig = Figure(figsize=(12, 8), layout="constrained")
+    ax = fig.subplots()
     
     # Create display names
-    display_names = [CLASS_DISPLAY_NAMES.get(cls, cls.upper()) for cls in class_names]
+    display_names = _display_names(tuple(class_names))
     
-    # Create heatmap
+    # Create heatmap from a contiguous (n_classes, n_segments) copy, averaged
+    # down to at most one column per pixel of the 12 in. wide figure
+    times, columns = _downsample_for_display(
+        times, _class_major(intensities), target_pts=int(fig.get_figwidth() * fig.dpi), reduce="mean"
+    )
     im = ax.imshow(
-        intensities.T,
+        columns,
         aspect='auto',
         cmap='YlOrRd',
         interpolation='nearest',
         vmin=0,
-        vmax=1
+        vmax=1,
+        rasterized=True
     )
     
     # Set ticks
@@ -223,7 +379,7 @@ def create_confidence_heatmap(times, intensities, class_names):
     # Set x-axis to show time
     n_time_points = len(times)
     tick_positions = np.linspace(0, n_time_points - 1, min(10, n_time_points))
-    tick_labels = [f"{times[int(pos)]:.1f}s" for pos in tick_positions]
+    tick_labels = np.char.mod("%.1fs", times[tick_positions.astype(np.intp)])
     ax.set_xticks(tick_positions)
     ax.set_xticklabels(tick_labels, rotation=45)
     
@@ -233,8 +389,35 @@ def create_confidence_heatmap(times, intensities, class_names):
     ax.set_title("Instrument Confidence Heatmap", fontsize=14, fontweight='bold', pad=15)
     
     # Colorbar
-    cbar = plt.colorbar(im, ax=ax)
+    cbar = fig.colorbar(im, ax=ax)
     cbar.set_label("Confidence", rotation=270, labelpad=20, fontsize=11)
-    
-    plt.tight_layout()
     return fig
+
+
+@contextmanager
+def managed_figure(factory, *args, **kwargs):
+    """
+    Build a figure with one of the plot functions above and release it on exit
+    
+    The plot functions create a new figure on every call and leave freeing it
+    to the caller. Loops that render many plots can use this instead, e.g.
+    
+        with managed_figure(create_confidence_heatmap, times, intensities, CLASS_NAMES) as fig:
+            fig.savefig(path)
+    
+    Args:
+        factory: Plot function returning a matplotlib figure
+        *args, **kwargs: Passed on to factory
+    
+    Yields:
+        matplotlib figure
+    """
+    fig = factory(*args, **kwargs)
+    try:
+        yield fig
+    finally:
+        # Drop the artists, detach the figure from pyplot in case it is
+        # registered there, and collect the reference cycles between them
+        fig.clear()
+        plt.close(fig)
+        gc.collect()